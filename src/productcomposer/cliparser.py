@@ -1,5 +1,5 @@
 from argparse import ArgumentParser
-from productcomposer.config import DEFAULT_EULADIR
+from productcomposer.config import (DEFAULT_EULADIR, DEFAULT_HEADER_CACHE)
 
 def build_parser():
     parser = ArgumentParser('productcomposer')
@@ -13,11 +13,14 @@ def build_parser():
     #verify_parser.set_defaults(func=verify)
     #build_parser.set_defaults(func=build)
 
-    # Generic options
+    # Generic options, a pool database excludes the build's pool snapshot
+    pool_groups = {}
     for cmd_parser in (verify_parser, build_parser):
         cmd_parser.add_argument('-f', '--flavor', help='Build a given flavor')
         cmd_parser.add_argument('-v', '--verbose', action='store_true', help='Enable verbose output')
         cmd_parser.add_argument('--reposdir', action='store', help='Take packages from this directory')
+        pool_groups[cmd_parser] = cmd_parser.add_mutually_exclusive_group()
+        pool_groups[cmd_parser].add_argument('--pool-db', default=None, help='Keep the package pool in this SQLite database, it is reused by later runs')
         cmd_parser.add_argument('filename', default='default.productcompose', help='Filename of product YAML spec')
 
     # build command options
@@ -27,6 +30,12 @@ def build_parser():
     build_parser.add_argument('--vcs', default=None, help='Define a source repository identifier')
     build_parser.add_argument('--clean', action='store_true', help='Remove existing output directory first')
     build_parser.add_argument('--euladir', default=DEFAULT_EULADIR, help='Directory containing EULA data')
+    build_parser.add_argument('-j', '--jobs', type=int, default=1, help='Number of processes used for scanning the rpm headers')
+    build_parser.add_argument('--header-cache', default=DEFAULT_HEADER_CACHE, help='File used to cache the rpm header data between runs')
+    build_parser.add_argument('--no-header-cache', action='store_true', help='Read all rpm headers, do not use the header cache')
+    build_parser.add_argument('--use-repodata', action='store_true', help='Take the package data from existing rpm-md repodata in the packages directory')
+    pool_groups[build_parser].add_argument('--pool-snapshot', default=None, help='Store the scanned pool in this file, later runs only rescan what changed')
+    build_parser.add_argument('--header-reader', choices=['librpm', 'mmap'], default='librpm', help='How the rpm headers are read, mmap parses them without librpm')
     build_parser.add_argument('out', help='Directory to write the result')
 
     return parser
\ No newline at end of file
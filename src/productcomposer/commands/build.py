@@ -1,16 +1,22 @@
 import os
 import shutil
+import sqlite3
 
 from . import register
 from ..parsers.yamlparser import parse_yaml
 from ..parsers.supportstatusparser import parse_supportstatus
 from ..parsers.eulasparser import parse_eulas
-from ..utils.loggerutils import (die, note)
+from ..utils.loggerutils import (die, warn, note)
 from ..createartifacts.createtree import create_tree
+from ..utils.report import TreeManifest
+from ..utils.rpmutils import PkgSetResolver
 from ..core.Pool import Pool
+from ..core.SqlitePool import SqlitePool, SqlitePoolError
+from ..core.HeaderCache import HeaderCache
+from ..core.Package import Package
 
 # hashed via file name
-tree_report = {}
+tree_report = TreeManifest()
 # global db for eulas
 eulas = {}
 # global db for supportstatus
@@ -74,22 +80,55 @@ class BuildCommand:
         if args.euladir and os.path.isdir(args.euladir):
             parse_eulas(args.euladir, eulas)
 
-        pool = Pool()
+        header_cache = None
+        if not args.no_header_cache:
+            header_cache = HeaderCache(args.header_cache)
+
+        Package.header_reader = args.header_reader
+        changes = None
         note(f"Scanning: {reposdir}")
-        pool.scan(reposdir)
+        if args.pool_db:
+            try:
+                pool = SqlitePool(args.pool_db)
+            except (SqlitePoolError, sqlite3.Error) as e:
+                die(f"Unable to open the pool database {args.pool_db}: {e}")
+            pool.scan(reposdir, jobs=args.jobs, header_cache=header_cache, use_repodata=args.use_repodata,
+                      arches=yml['architectures'])
+            changes = pool.changes
+        else:
+            pool = Pool()
+            if args.pool_snapshot and pool.load_snapshot(args.pool_snapshot, reposdir, yml['architectures'], args.use_repodata):
+                changes = pool.rescan(jobs=args.jobs, header_cache=header_cache)
+            else:
+                pool.scan(reposdir, jobs=args.jobs, header_cache=header_cache, use_repodata=args.use_repodata,
+                          arches=yml['architectures'])
+            if args.pool_snapshot:
+                try:
+                    pool.save_snapshot(args.pool_snapshot)
+                except OSError as e:
+                    warn(f"Unable to write the pool snapshot {args.pool_snapshot}: {e}")
+
+        if changes is not None:
+            note(f"Pool changes: {len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed")
+            if args.verbose:
+                for change, origins in changes.items():
+                    for origin in origins:
+                        note(f"  {change}: {origin}")
+
+        if header_cache is not None:
+            note(f"Header cache: {header_cache.hits} hits, {header_cache.misses} misses")
+            try:
+                header_cache.save()
+            except OSError as e:
+                warn(f"Unable to write the header cache {args.header_cache}: {e}")
 
         # clean up blacklisted packages
-        for u in sorted(pool.lookup_all_updateinfos()):
-            for update in u.root.findall('update'):
-                if not update.find('blocked_in_product'):
-                    continue
-
-                parent = update.findall('pkglist')[0].findall('collection')[0]
-                for pkgentry in parent.findall('package'):
-                    name = pkgentry.get('name')
-                    epoch = pkgentry.get('epoch')
-                    version = pkgentry.get('version')
-                    pool.remove_rpms(None, name, '=', epoch, version, None)
+        blocked = [(update.id, [(pkg.name, pkg.epoch, pkg.version) for pkg in update.packages])
+                   for update in pool.update_index.blocked()]
+        removed = pool.remove_rpm_versions({key for _, keys in blocked for key in keys})
+        for updateid, keys in blocked:
+            dropped = {rpm.location for key in keys for rpm in removed.get(key, [])}
+            note(f"Blocked update {updateid}: {len(dropped)} binaries removed")
 
         if args.clean and os.path.exists(args.out):
             shutil.rmtree(args.out)
@@ -103,4 +142,8 @@ class BuildCommand:
 
         product_base_dir = self.get_product_dir(yml, flavor, args.release)
 
-        create_tree(args.out, product_base_dir, yml, pool, flavor, tree_report, supportstatus, supportstatus_override, eulas, args.vcs, args.disturl)
+        # the package sets are evaluated once for the whole build
+        pkgsets = PkgSetResolver(yml, pool)
+        create_tree(args.out, product_base_dir, yml, pool, pkgsets, flavor, tree_report, supportstatus, supportstatus_override, eulas, args.vcs, args.disturl)
+        note(f"Package lookups: {pool.lookup_hits} cached, {pool.lookup_misses} computed")
+        note(f"Package sets: {pkgsets.stats['evaluated']} evaluated, {pkgsets.stats['cached']} cached")
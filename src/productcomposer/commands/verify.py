@@ -1,8 +1,12 @@
+import os
+import sqlite3
+
 from ..parsers.yamlparser import parse_yaml
 from . import register
 from ..utils.loggerutils import die
-from ..utils.rpmutils import create_package_set
+from ..utils.rpmutils import PkgSetResolver
 from ..core.Pool import Pool
+from ..core.SqlitePool import SqlitePool, SqlitePoolError
 
 # global db for eulas
 eulas = {}
@@ -17,7 +21,7 @@ class VerifyCommand:
     def run(self, args):
         self.verify(args)
 
-    def verify_flavor(self, filename, flavor):
+    def verify_flavor(self, filename, flavor, pool_db=None):
         yml = parse_yaml(filename, flavor)
         if not flavor and not yml['architectures']:
             # no default build defined, skipping
@@ -25,17 +29,38 @@ class VerifyCommand:
         if not yml['architectures']:
             die(f'No architecture defined for flavor {flavor}')
 
-        # check package sets
+        # check package sets, a pool database of an earlier build resolves
+        # them against the real packages
+        pool = Pool()
+        if pool_db:
+            pool = self.open_pool_db(pool_db)
+        pkgsets = PkgSetResolver(yml, pool)
         for arch in yml['architectures']:
-            pool = Pool()
             for pkgset_name in yml['content']:
-                create_package_set(yml, arch, flavor, pkgset_name, pool=pool)
+                pkgsets.get(arch, flavor, pkgset_name)
             for pkgset_name in yml['unpack']:
-                create_package_set(yml, arch, flavor, pkgset_name, pool=pool)
+                pkgsets.get(arch, flavor, pkgset_name)
+        if pool_db:
+            pool.close()
         return yml.get('flavors')
 
+    @staticmethod
+    def open_pool_db(pool_db):
+        # do not create an empty database for a wrong path
+        if not os.path.isfile(pool_db):
+            die(f'Pool database {pool_db} does not exist')
+        try:
+            pool = SqlitePool(pool_db, readonly=True)
+            directory = pool.directory()
+        except (SqlitePoolError, sqlite3.Error) as e:
+            die(f'Unable to open the pool database {pool_db}: {e}')
+        if directory is None:
+            pool.close()
+            die(f'Pool database {pool_db} does not contain a scan')
+        return pool
+
     def verify(self, args):
-        flavors = self.verify_flavor(args.filename, args.flavor)
+        flavors = self.verify_flavor(args.filename, args.flavor, args.pool_db)
         if args.flavor is None:
             for flavor in flavors:
-                self.verify_flavor(args.filename, flavor)
+                self.verify_flavor(args.filename, flavor, args.pool_db)
@@ -1,4 +1,7 @@
+import os
+
 DEFAULT_EULADIR = "/usr/share/doc/packages/eulas"
+DEFAULT_HEADER_CACHE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'productcomposer', 'rpmheaders.cache')
 ET_ENCODING = "unicode"
 ISO_PREPARER = "Product Composer - http://www.github.com/openSUSE/product-composer"
 
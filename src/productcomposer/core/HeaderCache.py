@@ -0,0 +1,80 @@
+""" Persistent rpm header cache
+
+"""
+
+import os
+import pickle
+
+from ..utils.loggerutils import warn
+
+
+class HeaderCache:
+    # bump when the layout of the cached package data changes
+    FORMAT = 3
+
+    def __init__(self, filename, maxentries=200000):
+        self.filename = filename
+        self.maxentries = maxentries
+        self.entries = {}
+        self.generation = 0
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+        self.generation += 1
+
+    def _load(self):
+        # a broken cache must not break the build, start with an empty one
+        try:
+            with open(self.filename, 'rb') as f:
+                data = pickle.load(f)
+            if not isinstance(data, dict) or data.get('format') != HeaderCache.FORMAT:
+                return
+            entries = data['entries']
+            generation = data['generation']
+            if not isinstance(entries, dict) or not isinstance(generation, int):
+                raise TypeError('unexpected content')
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            warn(f"Ignoring the header cache {self.filename}: {e}")
+            return
+        self.entries = entries
+        self.generation = generation
+
+    @staticmethod
+    def _stamp(st):
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get(self, location, st):
+        """ Return the cached package data if the file did not change """
+        location = os.path.abspath(location)
+        entry = self.entries.get(location)
+        if entry is None or entry[0] != HeaderCache._stamp(st):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if entry[1] != self.generation:
+            self.entries[location] = (entry[0], self.generation, entry[2])
+            self.dirty = True
+        return entry[2]
+
+    def put(self, location, st, data):
+        self.entries[os.path.abspath(location)] = (HeaderCache._stamp(st), self.generation, data)
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        if len(self.entries) > self.maxentries:
+            # drop the entries that were not used for the longest time
+            keep = sorted(self.entries.items(), key=lambda item: item[1][1], reverse=True)[:self.maxentries]
+            self.entries = dict(keep)
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        tmpname = f"{self.filename}.{os.getpid()}.tmp"
+        with open(tmpname, 'wb') as f:
+            pickle.dump({'format': HeaderCache.FORMAT, 'generation': self.generation, 'entries': self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, self.filename)
+        self.dirty = False
+
+# vim: sw=4 et
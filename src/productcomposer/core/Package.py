@@ -1,36 +1,72 @@
 """ Package base class
 
 """
+import contextlib
 import os
 import re
+import struct
+import sys
 import rpm
 import functools
 
+from .evr import evr_key
+from .RpmHeader import RpmHeader, RpmHeaderError
+
 
 @functools.total_ordering
 class Package:
-    def __init__(self, location=None, rpm_ts=None):
+    # tags that are read when scanning the pool, the file lists are
+    # only loaded on demand
+    TAGS = ('name', 'epoch', 'version', 'release', 'arch', 'sourcerpm',
+            'buildtime', 'disturl', 'license')
+    FILELIST_TAGS = ('filesizes', 'filemodes', 'filedevices', 'fileinodes',
+                     'dirindexes', 'basenames', 'dirnames')
+
+    __slots__ = ('location', 'origin', 'name', 'epoch', 'version', 'release', 'arch',
+                 'sourcerpm', 'buildtime', '_disturl', 'license', '_provides', '_requires',
+                 '_product_cpeid', '_filelists', '_evrkey')
+
+    # 'librpm' or 'mmap', see RpmHeader
+    header_reader = 'librpm'
+
+    def __init__(self, location=None, rpm_ts=None, cachedata=None):
+        self.location = location
+        self._provides = None
+        self._requires = None
+        self._filelists = None
         if location is None:
             return
-        self.location = location
-        h = self._read_rpm_header(rpm_ts=rpm_ts)
-        for tag in 'name', 'epoch', 'version', 'release', 'arch', 'sourcerpm', \
-                   'buildtime', 'disturl', 'license', 'filesizes', 'filemodes', \
-                   'filedevices', 'fileinodes', 'dirindexes', 'basenames', 'dirnames':
+        if cachedata is not None:
+            for tag, val in zip(Package.TAGS, cachedata[0]):
+                setattr(self, tag, val)
+            (self._provides, self._requires) = cachedata[1:]
+        else:
+            self._from_rpm_header(self._set_header_tags, rpm_ts=rpm_ts)
+            if self._disturl is None:
+                self._disturl = ''
+            self.epoch = str(self.epoch) if self.epoch else '0'
+        # there are only a few different values, so share the strings
+        self.arch = sys.intern(self.arch)
+        if self.license:
+            self.license = sys.intern(self.license)
+
+    def _set_header_tags(self, h):
+        for tag in Package.TAGS:
             val = h[tag]
             if isinstance(val, bytes):
                 val = val.decode('utf-8')
             setattr(self, tag, val)
         if not self.sourcerpm:
             self.arch = 'nosrc' if h['nosource'] or h['nopatch'] else 'src'
-        self.epoch = str(self.epoch) if self.epoch else '0'
+        self._provides = Package._read_deps(h, 'provides')
+        self._requires = Package._read_deps(h, 'requires')
 
     def __eq__(self, other):
         return (self.name, self.evr) == (other.name, other.evr)
 
     def __lt__(self, other):
         if self.name == other.name:
-            return rpm.labelCompare((self.epoch, self.version, self.release), (other.epoch, other.version, other.release)) == -1
+            return self.evrkey < other.evrkey
         return self.name < other.name
 
     def __str__(self):
@@ -42,6 +78,30 @@ class Package:
             return f"{self.epoch}:{self.version}-{self.release}"
         return f"{self.version}-{self.release}"
 
+    @property
+    def disturl(self):
+        # rpm-md repodata does not contain the disturl, it is read from
+        # the rpm when needed
+        if self._disturl is None and self.location is not None:
+            disturl = self._from_rpm_header(lambda h: h['disturl'])
+            if isinstance(disturl, bytes):
+                disturl = disturl.decode('utf-8')
+            self._disturl = disturl or ''
+        return self._disturl
+
+    @disturl.setter
+    def disturl(self, value):
+        self._disturl = value
+
+    @property
+    def evrkey(self):
+        """ Sort key that orders like rpm.labelCompare """
+        try:
+            return self._evrkey
+        except AttributeError:
+            self._evrkey = evr_key(self.epoch, self.version, self.release)
+            return self._evrkey
+
     @property
     def nevra(self):
         return f"{self.name}-{self.evr}.{self.arch}"
@@ -50,16 +110,45 @@ class Package:
     def canonfilename(self):
         return f"{self.name}-{self.version}-{self.release}.{self.arch}.rpm"
 
+    @staticmethod
+    def _read_deps(h, tag):
+        if isinstance(h, RpmHeader):
+            deps = h.deps(tag)
+        else:
+            deps = (dep.DNEVR()[2:] for dep in rpm.ds(h, tag))
+        # many packages share the same dependencies
+        return tuple(sys.intern(dep) for dep in deps)
+
     @property
     def provides(self):
-        h = self._read_rpm_header()
-        if h is None:
-            return None
-        return [dep.DNEVR()[2:] for dep in rpm.ds(h, 'provides')]
+        if self._provides is None:
+            self._provides = self._from_rpm_header(lambda h: Package._read_deps(h, 'provides'))
+        return self._provides
 
-    def _read_rpm_header(self, rpm_ts=None):
+    @property
+    def requires(self):
+        if self._requires is None:
+            self._requires = self._from_rpm_header(lambda h: Package._read_deps(h, 'requires'))
+        return self._requires
+
+    @property
+    def cachedata(self):
+        """ The header data in the format used by the header cache
+
+        A disturl that was not read yet stays None.
+        """
+        tags = tuple(self._disturl if tag == 'disturl' else getattr(self, tag) for tag in Package.TAGS)
+        return (tags, self.provides, self.requires)
+
+    def _read_rpm_header(self, rpm_ts=None, header_reader=None):
         if self.location is None:
             return None
+        if (header_reader or Package.header_reader) == 'mmap':
+            try:
+                return RpmHeader(self.location)
+            except (RpmHeaderError, ValueError, struct.error):
+                # let librpm deal with anything unusual
+                pass
         if rpm_ts is None:
             rpm_ts = self.create_rpm_ts()
         fd = os.open(self.location, os.O_RDONLY)
@@ -67,6 +156,35 @@ class Package:
         os.close(fd)
         return h
 
+    @contextlib.contextmanager
+    def _rpm_header(self, rpm_ts=None, header_reader=None):
+        """ The header of the rpm, the mapping of an RpmHeader is closed
+        afterwards """
+        h = self._read_rpm_header(rpm_ts=rpm_ts, header_reader=header_reader)
+        try:
+            yield h
+        finally:
+            if isinstance(h, RpmHeader):
+                h.close()
+
+    def _from_rpm_header(self, read, rpm_ts=None):
+        """ Call read with the header of the rpm, None without a location
+
+        Reads the header again with librpm if the mmap reader fails on a
+        tag, e.g. because of a corrupt string store.
+        """
+        if self.location is None:
+            return None
+        with self._rpm_header(rpm_ts=rpm_ts) as h:
+            if not isinstance(h, RpmHeader):
+                return read(h)
+            try:
+                return read(h)
+            except (RpmHeaderError, ValueError, struct.error):
+                pass
+        with self._rpm_header(rpm_ts=rpm_ts, header_reader='librpm') as h:
+            return read(h)
+
     @staticmethod
     def create_rpm_ts():
         ts = rpm.TransactionSet()
@@ -84,13 +202,20 @@ class Package:
             pout = pout + match.group(1) + chr(int(match.group(2), 16))
             p = match.group(3)
 
-    @functools.cached_property
-    def product_cpeid(self):
+    def get_product_cpeid_provides(self):
+        """ The encoded values of the product-cpeid() provides """
         cpeid_prefix = "product-cpeid() = "
-        for dep in self.provides:
-            if dep.startswith(cpeid_prefix):
-                return Package._cpeid_hexdecode(dep[len(cpeid_prefix):])
-        return None
+        return [dep[len(cpeid_prefix):] for dep in self.provides if dep.startswith(cpeid_prefix)]
+
+    @property
+    def product_cpeid(self):
+        try:
+            return self._product_cpeid
+        except AttributeError:
+            pass
+        cpeids = self.get_product_cpeid_provides()
+        self._product_cpeid = Package._cpeid_hexdecode(cpeids[0]) if cpeids else None
+        return self._product_cpeid
 
     def get_src_package(self):
         if not self.sourcerpm:
@@ -114,29 +239,31 @@ class Package:
                 return False
         if op is None:
             return True
-        # special case a missing release or epoch in the match as labelCompare
-        # does not handle it
-        tepoch = self.epoch if epoch is not None else None
-        trelease = self.release if release is not None else None
-        cmp = rpm.labelCompare((tepoch, self.version, trelease), (epoch, version, release))
+        # a missing release or epoch in the match matches every one
+        key = self.evrkey
+        target = evr_key(epoch, version, release)
+        if epoch is None:
+            target = (key[0],) + target[1:]
+        if release is None:
+            target = target[:2] + (key[2],)
+        cmp = (key > target) - (key < target)
         if cmp > 0:
             return '>' in op
         if cmp < 0:
             return '<' in op
         return '=' in op
 
+    def _load_filelists(self):
+        if self._filelists is None:
+            self._filelists = self._from_rpm_header(lambda h: tuple(h[tag] for tag in Package.FILELIST_TAGS))
+        return self._filelists
+
     def get_directories(self):
-        h = self._read_rpm_header()
-        if h is None:
+        filelists = self._load_filelists()
+        if filelists is None:
             return None
         dirs = {}
-        filedevs = h['filedevices']
-        fileinos = h['fileinodes']
-        filesizes = h['filesizes']
-        filemodes = h['filemodes']
-        dirnames = h['dirnames']
-        dirindexes = h['dirindexes']
-        basenames = h['basenames']
+        (filesizes, filemodes, filedevs, fileinos, dirindexes, basenames, dirnames) = filelists
         if not basenames:
             return dirs
         for basename, dirindex, filesize, filemode, filedev, fileino in zip(basenames, dirindexes, filesizes, filemodes, filedevs, fileinos):
@@ -3,7 +3,8 @@
 """
 
 import re
-import rpm
+
+from .evr import evr_key
 
 
 class PkgSelect:
@@ -29,6 +30,18 @@ class PkgSelect:
             self.epoch = None
             self.version = None
             self.release = None
+        self._set_key()
+
+    def _set_key(self):
+        # canonical form of the selector for hashing and comparing, the
+        # same fields as in str()
+        if self.op is None:
+            self.key = (self.name,)
+            self.evrkey = None
+        else:
+            epoch = self.epoch if self.epoch and self.epoch != '0' else None
+            self.key = (self.name, self.op, epoch, self.version, self.release)
+            self.evrkey = evr_key(self.epoch, self.version, self.release)
 
     def matchespkg(self, arch, pkg):
         return pkg.matches(arch, self.name, self.op, self.epoch, self.version, self.release)
@@ -55,9 +68,13 @@ class PkgSelect:
         return outop
 
     def _cmp_evr(self, other):
-        release1 = self.release if self.release is not None else other.release
-        release2 = other.release if other.release is not None else self.release
-        return rpm.labelCompare((self.epoch, self.version, release1), (other.epoch, other.version, release2))
+        key1 = self.evrkey
+        key2 = other.evrkey
+        # a missing release on one side is taken from the other one
+        if self.release is None or other.release is None:
+            key1 = key1[:2]
+            key2 = key2[:2]
+        return (key1 > key2) - (key1 < key2)
 
     def _throw_unsupported_sub(self, other):
         raise RuntimeError(f"unsupported sub operation: {self}, {other}")
@@ -71,15 +88,12 @@ class PkgSelect:
         if other.op is None:
             return None
         if self.op is None:
-            out = self.copy()
-            out.op = PkgSelect._sub_ops('<=>', other.op)
-            return out
+            return self.copy(op=PkgSelect._sub_ops('<=>', other.op))
         cmp = self._cmp_evr(other)
         if cmp == 0:
             if (self.release is not None and other.release is None) or (other.release is not None and self.release is None):
                 self._throw_unsupported_sub(other)
-            out = self.copy()
-            out.op = PkgSelect._sub_ops(self.op, other.op)
+            out = self.copy(op=PkgSelect._sub_ops(self.op, other.op))
             return out if out.op != '' else None
         elif cmp < 0:
             if '>' in self.op:
@@ -100,11 +114,11 @@ class PkgSelect:
             return other
         cmp = self._cmp_evr(other)
         if cmp == 0:
+            op = PkgSelect._intersect_ops(self.op, other.op)
             if self.release is not None or other.release is None:
-                out = self.copy()
+                out = self.copy(op=op)
             else:
-                out = other.copy()
-            out.op = PkgSelect._intersect_ops(self.op, other.op)
+                out = other.copy(op=op)
             if out.op == '':
                 if (self.release is not None and other.release is None) or (other.release is not None and self.release is None):
                     self._throw_unsupported_intersect(other)
@@ -126,13 +140,14 @@ class PkgSelect:
                 return None
         self._throw_unsupported_intersect(other)
 
-    def copy(self):
+    def copy(self, op=None):
         out = PkgSelect(self.name)
-        out.op = self.op
+        out.op = op if op is not None else self.op
         out.epoch = self.epoch
         out.version = self.version
         out.release = self.release
         out.supportstatus = self.supportstatus
+        out._set_key()
         return out
 
     def __str__(self):
@@ -146,13 +161,9 @@ class PkgSelect:
         return self.name + ' ' + self.op + ' ' + evr
 
     def __hash__(self):
-        if self.op:
-            return hash((self.name, self.op, self.epoch, self.version, self.release))
-        return hash(self.name)
+        return hash(self.key)
 
     def __eq__(self, other):
-        if self.name != other.name:
-            return False
-        return str(self) == str(other)
+        return self.key == other.key
 
 # vim: sw=4 et
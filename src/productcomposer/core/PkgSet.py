@@ -9,43 +9,41 @@ class PkgSet:
     def __init__(self, name):
         self.name = name
         self.pkgs = []
-        self.byname = None
+        # name -> selectors and the keys of all selectors, kept up to
+        # date by the set operations
+        self.byname = {}
+        self.keys = set()
         self.supportstatus = None
         self.override_supportstatus = False
 
-    def _create_byname(self):
-        byname = {}
-        for sel in self.pkgs:
-            name = sel.name
-            if name not in byname:
-                byname[name] = []
-            byname[name].append(sel)
-        self.byname = byname
+    def _append(self, sel):
+        self.pkgs.append(sel)
+        self.byname.setdefault(sel.name, []).append(sel)
+        self.keys.add(sel.key)
 
-    def _byname(self):
-        if self.byname is None:
-            self._create_byname()
-        return self.byname
+    def _replace(self, pkgs):
+        self.pkgs = []
+        self.byname = {}
+        self.keys = set()
+        for sel in pkgs:
+            self._append(sel)
 
     def add_specs(self, specs):
         for spec in specs:
-            sel = PkgSelect(spec, supportstatus=self.supportstatus)
-            self.pkgs.append(sel)
-        self.byname = None
+            self._append(PkgSelect(spec, supportstatus=self.supportstatus))
 
     def add(self, other):
-        s1 = set(self)
         for sel in other.pkgs:
-            if sel not in s1:
+            if sel.key not in self.keys:
                 if self.override_supportstatus or (self.supportstatus is not None and sel.supportstatus is None):
                     sel = sel.copy()
                     sel.supportstatus = self.supportstatus
-                self.pkgs.append(sel)
-                s1.add(sel)
-        self.byname = None
+                self._append(sel)
 
     def sub(self, other):
-        otherbyname = other._byname()
+        otherbyname = other.byname
+        if otherbyname.keys().isdisjoint(self.byname):
+            return
         pkgs = []
         for sel in self.pkgs:
             name = sel.name
@@ -57,29 +55,24 @@ class PkgSet:
                     sel = sel.sub(other_sel)
             if sel is not None:
                 pkgs.append(sel)
-        self.pkgs = pkgs
-        self.byname = None
+        self._replace(pkgs)
 
     def intersect(self, other):
-        otherbyname = other._byname()
+        otherbyname = other.byname
         pkgs = []
         s1 = set()
-        pkgs = []
         for sel in self.pkgs:
             name = sel.name
             if name not in otherbyname:
                 continue
             for osel in otherbyname[name]:
                 isel = sel.intersect(osel)
-                if isel and isel not in s1:
+                if isel and isel.key not in s1:
                     pkgs.append(isel)
-                    s1.add(isel)
-        self.pkgs = pkgs
-        self.byname = None
+                    s1.add(isel.key)
+        self._replace(pkgs)
 
     def matchespkg(self, arch, pkg):
-        if self.byname is None:
-            self._create_byname()
         if pkg.name not in self.byname:
             return False
         for sel in self.byname[pkg.name]:
@@ -88,8 +81,6 @@ class PkgSet:
         return False
 
     def names(self):
-        if self.byname is None:
-            self._create_byname()
         return set(self.byname.keys())
 
     def __str__(self):
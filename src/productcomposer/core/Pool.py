@@ -3,18 +3,75 @@
 """
 
 import os
+import pickle
+import re
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 from .Package import Package
+from .evr import (evr_key, vercmp_key)
+from ..utils.repomdutils import iter_primary_packages
 from .Updateinfo import Updateinfo
+from .UpdateIndex import UpdateIndex
+from ..utils.loggerutils import warn
+
+
+# architecture in a canonical rpm file name
+_rpm_filename_arch_re = re.compile(r'\.([a-z][a-z0-9_]*)\.rpm$')
+
+# the stat data of a scanned file, duck types os.stat_result
+_FileStat = namedtuple('_FileStat', ('st_size', 'st_mtime', 'st_mtime_ns', 'st_ino'))
+
+# rpm transaction set of a scan worker process
+_worker_rpm_ts = None
+
+def _init_scan_worker(header_reader):
+    global _worker_rpm_ts
+    # the class setting is not inherited by spawned workers
+    Package.header_reader = header_reader
+    _worker_rpm_ts = Package.create_rpm_ts()
+
+def _scan_rpm(location):
+    return Package(location, rpm_ts=_worker_rpm_ts)
+
+def _evrkey(pkg):
+    return pkg.evrkey
+
+def _evkey(pkg):
+    return pkg.evrkey[:2]
 
 
 class Pool:
+    # bump when the layout of the pool snapshot changes
+    SNAPSHOT_FORMAT = 3
+
     def __init__(self):
+        # name -> packages sorted by evr
         self.rpms = {}
+        # arch -> name -> packages sorted by evr
+        self.byarch = {}
         self.updateinfos = {}
+        self.update_index = UpdateIndex()
+        # (name, version key, release key, arch) -> packages
+        self.nvra = {}
+        # source rpm file name -> binary packages built from it
+        self.bysourcerpm = {}
+        # location -> encoded product-cpeid() provides
+        self.product_cpeids = {}
+        # location -> package, in the order the packages were added
+        self.bylocation = {}
+        # directory, architectures, repodata use and directory state of
+        # the last scan
+        self.scan_state = None
+        # name -> query -> result of lookup_rpm/lookup_all_rpms
+        self.lookup_cache = {}
+        self.lookup_hits = 0
+        self.lookup_misses = 0
 
-    def make_rpm(self, location, rpm_ts=None):
-        return Package(location, rpm_ts=rpm_ts)
+    def make_rpm(self, location, rpm_ts=None, cachedata=None):
+        return Package(location, rpm_ts=rpm_ts, cachedata=cachedata)
 
     def make_updateinfo(self, location):
         return Updateinfo(location)
@@ -23,51 +80,521 @@ class Pool:
         if origin is not None:
             pkg.origin = origin
         name = pkg.name
+        self.lookup_cache.pop(name, None)
         if name not in self.rpms:
             self.rpms[name] = []
-        self.rpms[name].append(pkg)
+        # packages with the same evr stay in the order they were added
+        insort(self.rpms[name], pkg, key=_evrkey)
+        insort(self.byarch.setdefault(pkg.arch, {}).setdefault(name, []), pkg, key=_evrkey)
+        self.bylocation[pkg.location] = pkg
+        self.nvra.setdefault(Pool._nvrakey(pkg), []).append(pkg)
+        if pkg.sourcerpm:
+            self.bysourcerpm.setdefault(pkg.sourcerpm, []).append(pkg)
+        cpeids = pkg.get_product_cpeid_provides()
+        if cpeids:
+            self.product_cpeids[pkg.location] = cpeids
+
+    @staticmethod
+    def _nvrakey(pkg):
+        evrkey = pkg.evrkey
+        return (pkg.name, evrkey[1], evrkey[2], pkg.arch)
+
+    @staticmethod
+    def _filter_index(index, keys, remove):
+        """ Drop the packages with an id in remove from the lists of the keys """
+        for key in keys:
+            rpms = [rpm for rpm in index[key] if id(rpm) not in remove]
+            if rpms:
+                index[key] = rpms
+            else:
+                del index[key]
+
+    def _remove_file(self, location):
+        """ Drop the package or updateinfo of a file """
+        if location.endswith('updateinfo.xml'):
+            if self.updateinfos.pop(location, None) is not None:
+                self._reindex_updates()
+            return
+        pkg = self.bylocation.get(location)
+        if pkg is not None:
+            self._drop_rpms(pkg.name, [pkg])
 
     def add_updateinfo(self, uinfo):
+        replaced = uinfo.location in self.updateinfos
         self.updateinfos[uinfo.location] = uinfo
+        if replaced:
+            self._reindex_updates()
+        else:
+            self.update_index.add(uinfo)
+
+    def _reindex_updates(self):
+        self.update_index = UpdateIndex()
+        for uinfo in self.updateinfos.values():
+            self.update_index.add(uinfo)
 
-    def scan(self, directory):
+    def _read_rpms(self, locations, jobs=1):
+        if jobs > 1 and len(locations) > 1:
+            # read the headers in worker processes, executor.map keeps
+            # the order so that the pool content does not depend on the
+            # number of jobs
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_scan_worker,
+                                     initargs=(Package.header_reader,)) as executor:
+                chunksize = max(1, min(256, len(locations) // (jobs * 4)))
+                yield from executor.map(_scan_rpm, locations, chunksize=chunksize)
+            return
         rpm_ts = Package.create_rpm_ts()
-        for dirpath, dirs, files in os.walk(directory):
-            reldirpath = os.path.relpath(dirpath, directory)
-            for filename in files:
-                fname = os.path.join(dirpath, filename)
-                if filename.endswith('updateinfo.xml'):
-                    uinfo = self.make_updateinfo(fname)
-                    self.add_updateinfo(uinfo)
-                elif filename.endswith('.rpm'):
-                    pkg = self.make_rpm(fname, rpm_ts=rpm_ts)
-                    self.add_rpm(pkg, os.path.join(reldirpath, filename))
+        for location in locations:
+            yield self.make_rpm(location, rpm_ts=rpm_ts)
+
+    @staticmethod
+    def _read_repodata(directory):
+        """ Get the package data from the rpm-md repodata of a repository """
+        repodata = {}
+        for data in iter_primary_packages(directory):
+            location = os.path.normpath(os.path.join(directory, data['location']))
+            if not data['sourcerpm'] and not location.endswith(f".{data['arch']}.rpm"):
+                # can not tell a nosrc from a src package, read the header
+                continue
+            tags = tuple(data.get(tag) for tag in Package.TAGS)
+            repodata[location] = (data['size'], data['filetime'], (tags, tuple(data['provides']), tuple(data['requires'])))
+        return repodata
+
+    @staticmethod
+    def _list_directory(dirpath, mtime_ns, arches):
+        subdirs = []
+        files = {}
+        try:
+            with os.scandir(dirpath) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        # symlinks are not followed, like os.walk
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    if entry.name.endswith('.rpm'):
+                        if arches is not None:
+                            # skip packages of other architectures by their file name
+                            match = _rpm_filename_arch_re.search(entry.name)
+                            if match and match.group(1) not in arches:
+                                continue
+                    elif not entry.name.endswith('updateinfo.xml'):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    files[entry.name] = _FileStat(st.st_size, st.st_mtime, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            pass
+        return (mtime_ns, subdirs, files)
+
+    def _walk(self, directory, use_repodata=False, arches=None, oldstate=None):
+        """ Find the rpm and updateinfo files below directory
+
+        Returns the directory state and the repodata. The state maps the
+        directories relative to directory in walk order to (mtime_ns,
+        subdirectories, files), files maps the file names to their stat
+        data. A directory with the same mtime as in oldstate is not listed
+        again, its entries are taken from oldstate. This relies on the
+        rpms being replaced and not modified in place. Directories that
+        changed just before the scan are recorded without mtime, so they
+        are listed again by the next scan.
+        """
+        if arches is not None:
+            arches = set(arches) | {'noarch', 'src', 'nosrc'}
+        # a directory changed this close to the scan may change again
+        # without a different mtime on file systems with coarse timestamps
+        racy_ns = time.time_ns() - 2000000000
+        state = {}
+        repodata = {}
+        pending = [os.curdir]
+        while pending:
+            reldir = pending.pop()
+            dirpath = directory if reldir == os.curdir else os.path.join(directory, reldir)
+            try:
+                mtime_ns = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+            entry = oldstate.get(reldir) if oldstate else None
+            if entry is None or entry[0] != mtime_ns:
+                entry = Pool._list_directory(dirpath, mtime_ns if mtime_ns < racy_ns else None, arches)
+            state[reldir] = entry
+            if use_repodata and os.path.exists(os.path.join(dirpath, 'repodata', 'repomd.xml')):
+                repodata.update(Pool._read_repodata(dirpath))
+            # depth first in listing order, like os.walk
+            subdirs = entry[1] if reldir == os.curdir else [os.path.join(reldir, subdir) for subdir in entry[1]]
+            pending.extend(reversed(subdirs))
+        return (state, repodata)
+
+    @staticmethod
+    def _state_files(directory, state):
+        """ The (location, origin, stat) tuples of the files of a directory state """
+        for reldir, (_, _, files) in state.items():
+            dirpath = directory if reldir == os.curdir else os.path.join(directory, reldir)
+            for filename, st in files.items():
+                yield (os.path.join(dirpath, filename), os.path.join(reldir, filename), st)
+
+    def _iter_rpms(self, rpmfiles, stats, jobs=1, header_cache=None, repodata=None):
+        """ Create the packages of rpmfiles, yields (index, package) tuples
+
+        The packages known from the repodata or the header cache come
+        first, the rest is read from the rpm headers.
+        """
+        missing = []
+        for i, (fname, _) in enumerate(rpmfiles):
+            st = stats[i]
+            if st is not None:
+                data = repodata.get(os.path.normpath(fname)) if repodata else None
+                if data and data[0] == st.st_size and data[1] == int(st.st_mtime):
+                    yield (i, self.make_rpm(fname, cachedata=data[2]))
+                    continue
+                if header_cache is not None:
+                    cachedata = header_cache.get(fname, st)
+                    if cachedata is not None:
+                        yield (i, self.make_rpm(fname, cachedata=cachedata))
+                        continue
+            missing.append(i)
+
+        for i, pkg in zip(missing, self._read_rpms([rpmfiles[i][0] for i in missing], jobs=jobs)):
+            if header_cache is not None:
+                header_cache.put(pkg.location, stats[i], pkg.cachedata)
+            yield (i, pkg)
+
+    def _add_files(self, files, jobs=1, header_cache=None, repodata=None):
+        """ Add the packages and updateinfos of (location, origin, stat) tuples """
+        rpmfiles = []
+        stats = []
+        for fname, origin, st in files:
+            if fname.endswith('updateinfo.xml'):
+                self.add_updateinfo(self.make_updateinfo(fname))
+            else:
+                rpmfiles.append((fname, origin))
+                stats.append(st)
+
+        pkgs = [None] * len(rpmfiles)
+        for i, pkg in self._iter_rpms(rpmfiles, stats, jobs, header_cache, repodata):
+            pkgs[i] = pkg
+
+        for pkg, (_, origin) in zip(pkgs, rpmfiles):
+            self.add_rpm(pkg, origin)
+
+    def scan(self, directory, jobs=1, header_cache=None, use_repodata=False, arches=None):
+        (state, repodata) = self._walk(directory, use_repodata, arches)
+        self._add_files(Pool._state_files(directory, state), jobs, header_cache, repodata)
+        self.scan_state = {'directory': directory, 'arches': arches, 'use_repodata': use_repodata, 'dirs': state}
+
+    def rescan(self, jobs=1, header_cache=None):
+        """ Update the pool to the current content of the scanned directory
+
+        Only the directories that changed since the last scan are listed
+        and only new or changed rpms are read, they are added after the
+        existing packages, with the repodata if the scan used it. Returns
+        the sorted lists of the 'added', 'changed' and 'removed' files
+        relative to the directory.
+        """
+        directory = self.scan_state['directory']
+        olddirs = self.scan_state['dirs']
+        oldfiles = {origin: (fname, st) for fname, origin, st in Pool._state_files(directory, olddirs)}
+        (state, repodata) = self._walk(directory, self.scan_state['use_repodata'], self.scan_state['arches'], olddirs)
+
+        changes = {'added': [], 'changed': [], 'removed': []}
+        files = []
+        for fname, origin, st in Pool._state_files(directory, state):
+            old = oldfiles.pop(origin, None)
+            if old is not None and old[1] == st:
+                continue
+            if old is None:
+                changes['added'].append(origin)
+            else:
+                changes['changed'].append(origin)
+                self._remove_file(fname)
+            files.append((fname, origin, st))
+        for origin, (fname, _) in oldfiles.items():
+            changes['removed'].append(origin)
+            self._remove_file(fname)
+
+        self._add_files(files, jobs, header_cache, repodata)
+        self.scan_state['dirs'] = state
+        return {change: sorted(origins) for change, origins in changes.items()}
+
+    def save_snapshot(self, filename):
+        """ Store the scanned pool, call this before removing packages """
+        rpms = [(pkg.location, getattr(pkg, 'origin', None), pkg.cachedata) for pkg in self.bylocation.values()]
+        data = {
+            'format': Pool.SNAPSHOT_FORMAT,
+            'scan_state': self.scan_state,
+            'rpms': rpms,
+            'updateinfos': list(self.updateinfos.values()),
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        tmpname = f"{filename}.{os.getpid()}.tmp"
+        with open(tmpname, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+
+    def load_snapshot(self, filename, directory, arches=None, use_repodata=False):
+        """ Fill an empty pool from the snapshot of a scan of directory
+
+        Returns False if there is no usable snapshot of a scan with the
+        same arguments, the pool is not changed then.
+        """
+        # a broken snapshot must not break the build, it is scanned again
+        try:
+            with open(filename, 'rb') as f:
+                data = pickle.load(f)
+            if not isinstance(data, dict) or data.get('format') != Pool.SNAPSHOT_FORMAT:
+                return False
+            scan_state = data['scan_state']
+            if (scan_state['directory'], scan_state['arches'], scan_state['use_repodata']) != (directory, arches, use_repodata):
+                return False
+            rpms = [(self.make_rpm(location, cachedata=cachedata), origin) for location, origin, cachedata in data['rpms']]
+            updateinfos = list(data['updateinfos'])
+            if not isinstance(scan_state['dirs'], dict):
+                raise TypeError('unexpected scan state')
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            warn(f"Ignoring the pool snapshot {filename}: {e}")
+            return False
+        for pkg, origin in rpms:
+            self.add_rpm(pkg, origin)
+        for uinfo in updateinfos:
+            self.add_updateinfo(uinfo)
+        self.scan_state = scan_state
+        return True
+
+    @staticmethod
+    def _evr_ranges(rpms, op, epoch, version, release):
+        """ The index ranges of an evr sorted package list that match op """
+        if op is None:
+            return [(0, len(rpms))]
+        if epoch is None:
+            # the epoch is ignored in the comparison, so the list is not
+            # sorted by the compared key
+            return [(i, i + 1) for i, rpm in enumerate(rpms) if rpm.matches(None, None, op, epoch, version, release)]
+        if release is None:
+            # a missing release matches every release
+            key = _evkey
+            target = evr_key(epoch, version, None)[:2]
+        else:
+            key = _evrkey
+            target = evr_key(epoch, version, release)
+        lo = bisect_left(rpms, target, key=key)
+        hi = bisect_right(rpms, target, lo=lo, key=key)
+        ranges = []
+        if '<' in op:
+            ranges.append((0, lo))
+        if '=' in op:
+            ranges.append((lo, hi))
+        if '>' in op:
+            ranges.append((hi, len(rpms)))
+        return ranges
+
+    @staticmethod
+    def _arch_matches(rpm, arch):
+        if arch is None or rpm.arch == arch:
+            return True
+        return rpm.arch == 'noarch' and arch not in ('src', 'nosrc')
+
+    @staticmethod
+    def _compatible_archs(arch):
+        if arch in ('noarch', 'src', 'nosrc'):
+            return (arch,)
+        return (arch, 'noarch')
+
+    def _rpm_lists(self, arch, name):
+        """ The evr sorted package lists of a name that match the architecture """
+        if arch is None:
+            rpms = self.rpms.get(name)
+            return [rpms] if rpms else []
+        lists = []
+        for a in Pool._compatible_archs(arch):
+            rpms = self.byarch.get(a, {}).get(name)
+            if rpms:
+                lists.append(rpms)
+        return lists
+
+    @staticmethod
+    def _select_all_rpms(lists, op, epoch, version, release):
+        """ The packages of evr sorted lists that match, sorted by evr
+
+        The sort is stable, packages with the same evr keep the order of
+        their lists and within a list the order they were added in.
+        """
+        out = []
+        for rpms in lists:
+            for lo, hi in Pool._evr_ranges(rpms, op, epoch, version, release):
+                out += rpms[lo:hi]
+        if len(lists) > 1:
+            out.sort(key=_evrkey)
+        return out
+
+    @staticmethod
+    def _select_best_rpm(lists, op, epoch, version, release):
+        """ The package of evr sorted lists with the highest evr that matches """
+        best = None
+        for rpms in lists:
+            ranges = [(lo, hi) for lo, hi in Pool._evr_ranges(rpms, op, epoch, version, release) if lo < hi]
+            if not ranges:
+                continue
+            rpm = rpms[ranges[-1][1] - 1]
+            if best is not None and rpm.evrkey <= best.evrkey:
+                continue
+            # prefer the first added package of the same evr
+            best = rpms[bisect_left(rpms, rpm.evrkey, key=_evrkey)]
+        return best
+
+    def _lookup_all_rpms(self, arch, name, op=None, epoch=None, version=None, release=None):
+        return Pool._select_all_rpms(self._rpm_lists(arch, name), op, epoch, version, release)
+
+    def _lookup_rpm(self, arch, name, op=None, epoch=None, version=None, release=None):
+        return Pool._select_best_rpm(self._rpm_lists(arch, name), op, epoch, version, release)
+
+    @staticmethod
+    def join_pkgset(pkgset, rpm_lists, all_versions=True):
+        """ Match all selectors of a package set against packages
+
+        rpm_lists returns the evr sorted package lists of a name, it is
+        called once per name of the package set. Returns (selector,
+        packages) tuples in the order of the package set, packages is
+        just the best match without all_versions.
+        """
+        matches = {}
+        for name, sels in pkgset.byname.items():
+            lists = rpm_lists(name)
+            for sel in sels:
+                if not lists:
+                    matches[id(sel)] = []
+                elif all_versions:
+                    matches[id(sel)] = Pool._select_all_rpms(lists, sel.op, sel.epoch, sel.version, sel.release)
+                else:
+                    rpm = Pool._select_best_rpm(lists, sel.op, sel.epoch, sel.version, sel.release)
+                    matches[id(sel)] = [rpm] if rpm else []
+        return [(sel, matches[id(sel)]) for sel in pkgset]
+
+    def resolve_pkgset(self, arch, pkgset, all_versions=False):
+        """ Look up the packages of all selectors of a package set
+
+        Same as lookup_rpm or lookup_all_rpms for every selector, but the
+        packages of a name are only looked up once.
+        """
+        return Pool.join_pkgset(pkgset, lambda name: self._rpm_lists(arch, name), all_versions)
+
+    def _cached_lookup(self, lookup, arch, name, op, epoch, version, release):
+        cache = self.lookup_cache.setdefault(name, {})
+        query = (lookup, arch, op, epoch, version, release)
+        if query in cache:
+            self.lookup_hits += 1
+            return cache[query]
+        self.lookup_misses += 1
+        result = lookup(self, arch, name, op, epoch, version, release)
+        cache[query] = result
+        return result
 
     def lookup_all_rpms(self, arch, name, op=None, epoch=None, version=None, release=None):
-        if name not in self.rpms:
-            return []
-        return [rpm for rpm in self.rpms[name] if rpm.matches(arch, name, op, epoch, version, release)]
+        """ All packages of a name that match the architecture and evr
+
+        The packages are sorted by evr, not in scan order. Packages with
+        the same evr are in scan order, the ones of the architecture
+        before the noarch ones.
+        """
+        return list(self._cached_lookup(Pool._lookup_all_rpms, arch, name, op, epoch, version, release))
 
     def lookup_rpm(self, arch, name, op=None, epoch=None, version=None, release=None):
-        return max(self.lookup_all_rpms(arch, name, op, epoch, version, release), default=None)
+        return self._cached_lookup(Pool._lookup_rpm, arch, name, op, epoch, version, release)
+
+    @staticmethod
+    def _best_rpm(rpms):
+        best = None
+        for rpm in rpms:
+            if best is None or rpm.evrkey > best.evrkey:
+                best = rpm
+        return best
+
+    def lookup_nevra(self, arch, name, epoch, version, release):
+        """ Same as lookup_rpm with the '=' operator and a release, but a hash lookup """
+        vkey = vercmp_key(version)
+        rkey = vercmp_key(release)
+        rpms = self.nvra.get((name, vkey, rkey, arch), [])
+        if arch not in ('src', 'nosrc'):
+            rpms = rpms + self.nvra.get((name, vkey, rkey, 'noarch'), [])
+        if epoch is not None:
+            ekey = vercmp_key(epoch)
+            rpms = [rpm for rpm in rpms if rpm.evrkey[0] == ekey]
+        return Pool._best_rpm(rpms)
+
+    def lookup_sourcerpm_binary(self, sourcerpm, arch, name):
+        """ Find the binary package of the given name built from a source rpm """
+        rpms = [rpm for rpm in self.bysourcerpm.get(sourcerpm, []) if rpm.name == name and Pool._arch_matches(rpm, arch)]
+        return Pool._best_rpm(rpms)
+
+    def lookup_product_cpeids(self, pkg):
+        return self.product_cpeids.get(pkg.location, [])
 
     def lookup_all_updateinfos(self):
         return self.updateinfos.values()
 
+    def _drop_rpms(self, name, rpms):
+        """ Remove packages of the same name from the pool
+
+        Every affected index list is filtered once, no matter how many
+        of its packages are removed.
+        """
+        self.lookup_cache.pop(name, None)
+        remove = {id(rpm) for rpm in rpms}
+        self.rpms[name] = [rpm for rpm in self.rpms[name] if id(rpm) not in remove]
+        for arch in {rpm.arch for rpm in rpms}:
+            Pool._filter_index(self.byarch[arch], [name], remove)
+        Pool._filter_index(self.nvra, {Pool._nvrakey(rpm) for rpm in rpms}, remove)
+        Pool._filter_index(self.bysourcerpm, {rpm.sourcerpm for rpm in rpms if rpm.sourcerpm}, remove)
+        for rpm in rpms:
+            self.product_cpeids.pop(rpm.location, None)
+            if self.bylocation.get(rpm.location) is rpm:
+                del self.bylocation[rpm.location]
+
     def remove_rpms(self, arch, name, op=None, epoch=None, version=None, release=None):
-        if name not in self.rpms:
-            return
-        self.rpms[name] = [rpm for rpm in self.rpms[name] if not rpm.matches(arch, name, op, epoch, version, release)]
+        rpms = self._lookup_all_rpms(arch, name, op, epoch, version, release)
+        if rpms:
+            self._drop_rpms(name, rpms)
+
+    def remove_rpm_versions(self, keys):
+        """ Remove the packages matching (name, epoch, version) keys
+
+        Same as remove_rpms with the '=' operator and no release for
+        every key, but one pass over the packages of each name. A key
+        with a None epoch matches every epoch. Returns a dict that maps
+        the keys to the removed packages.
+        """
+        bynames = {}
+        for key in keys:
+            (name, epoch, version) = key
+            ekey = vercmp_key(epoch) if epoch is not None else None
+            bynames.setdefault(name, {}).setdefault((ekey, vercmp_key(version)), []).append(key)
+        removed = {}
+        for name, targets in bynames.items():
+            drop = []
+            for rpm in self._lookup_all_rpms(None, name):
+                (ekey, vkey) = rpm.evrkey[:2]
+                hits = targets.get((ekey, vkey), []) + targets.get((None, vkey), [])
+                if not hits:
+                    continue
+                drop.append(rpm)
+                for key in hits:
+                    removed.setdefault(key, []).append(rpm)
+            if drop:
+                self._drop_rpms(name, drop)
+        return removed
 
     def names(self, arch=None):
         if arch is None:
             return set(self.rpms.keys())
         names = set()
-        for name in self.rpms:
-            for pkg in self.rpms[name]:
-                if pkg.matches(arch, None, None, None, None, None):
-                    names.add(name)
-                    break
+        for a in Pool._compatible_archs(arch):
+            names.update(self.byarch.get(a, {}).keys())
         return names
 
 # vim: sw=4 et
@@ -0,0 +1,167 @@
+""" Memory mapped rpm header reader
+
+Reads the tags needed by the composer directly from the header section
+of an rpm file, without going through librpm. Only the lead, signature
+and main header are mapped, the payload is never touched.
+
+"""
+
+import mmap
+import os
+import struct
+
+LEAD_SIZE = 96
+HEADER_MAGIC = b'\x8e\xad\xe8\x01'
+
+# rpm tag type -> struct format of a single value
+_INT_TYPES = {2: 'B', 3: 'H', 4: 'I', 5: 'Q'}
+_STRING, _STRING_ARRAY, _I18NSTRING = 6, 8, 9
+
+# tags returned as a single value like librpm does
+SCALAR_TAGS = {
+    'name': 1000,
+    'version': 1001,
+    'release': 1002,
+    'epoch': 1003,
+    'buildtime': 1006,
+    'license': 1014,
+    'arch': 1022,
+    'sourcerpm': 1044,
+    'disturl': 1123,
+}
+
+ARRAY_TAGS = {
+    'oldfilenames': 1027,
+    'filesizes': 1028,
+    'filemodes': 1030,
+    'providename': 1047,
+    'requireflags': 1048,
+    'requirename': 1049,
+    'requireversion': 1050,
+    'nosource': 1051,
+    'nopatch': 1052,
+    'filedevices': 1095,
+    'fileinodes': 1096,
+    'provideflags': 1112,
+    'provideversion': 1113,
+    'dirindexes': 1116,
+    'basenames': 1117,
+    'dirnames': 1118,
+    'longfilesizes': 5008,
+}
+
+# rpmsenseFlags
+_SENSE_LESS = 0x02
+_SENSE_GREATER = 0x04
+_SENSE_EQUAL = 0x08
+_SENSE_MASK = 0x0f
+
+
+class RpmHeaderError(Exception):
+    pass
+
+
+class RpmHeader:
+    def __init__(self, location):
+        fd = os.open(location, os.O_RDONLY)
+        try:
+            sigstart = LEAD_SIZE
+            (sigcount, sigsize) = RpmHeader._read_intro(fd, sigstart)
+            sigsize = 16 + sigcount * 16 + sigsize
+            hdrstart = sigstart + sigsize + (8 - sigsize % 8) % 8
+            (count, datasize) = RpmHeader._read_intro(fd, hdrstart)
+            hdrend = hdrstart + 16 + count * 16 + datasize
+            if hdrend > os.fstat(fd).st_size:
+                raise RpmHeaderError(f"{location}: truncated rpm header")
+            self._map = mmap.mmap(fd, hdrend, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        self._data = memoryview(self._map)
+        self._store = hdrstart + 16 + count * 16
+        self._end = hdrend
+        self._index = {}
+        for i in range(count):
+            (tag, tagtype, offset, cnt) = struct.unpack_from('>iiii', self._data, hdrstart + 16 + i * 16)
+            self._index[tag] = (tagtype, offset, cnt)
+
+    def close(self):
+        self._data.release()
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _read_intro(fd, offset):
+        intro = os.pread(fd, 16, offset)
+        if len(intro) != 16 or intro[:4] != HEADER_MAGIC:
+            raise RpmHeaderError("bad rpm header magic")
+        return struct.unpack('>ii', intro[8:])
+
+    def _strings(self, offset, count):
+        out = []
+        for _ in range(count):
+            end = self._map.find(b'\0', offset, self._end)
+            if end == -1:
+                # corrupt or truncated string store
+                raise RpmHeaderError("unterminated string in rpm header")
+            out.append(str(self._data[offset:end], 'utf-8', 'surrogateescape'))
+            offset = end + 1
+        return out
+
+    def _get(self, tag):
+        entry = self._index.get(tag)
+        if entry is None:
+            return None
+        (tagtype, offset, count) = entry
+        if offset < 0 or self._store + offset > self._end:
+            raise RpmHeaderError("bad rpm header tag offset")
+        offset += self._store
+        if tagtype in _INT_TYPES:
+            return list(struct.unpack_from(f'>{count}{_INT_TYPES[tagtype]}', self._data, offset))
+        if tagtype == _STRING:
+            return self._strings(offset, 1)
+        if tagtype in (_STRING_ARRAY, _I18NSTRING):
+            # the first i18n string is the untranslated one
+            return self._strings(offset, 1 if tagtype == _I18NSTRING else count)
+        return bytes(self._data[offset:offset + count])
+
+    def __getitem__(self, name):
+        if name in SCALAR_TAGS:
+            val = self._get(SCALAR_TAGS[name])
+            return val[0] if val else None
+        if name == 'filesizes' and ARRAY_TAGS['filesizes'] not in self._index:
+            # packages with files >= 4GB only have the long sizes
+            return self['longfilesizes']
+        if name == 'basenames' and ARRAY_TAGS['basenames'] not in self._index and ARRAY_TAGS['oldfilenames'] in self._index:
+            raise RpmHeaderError("old style file list is not supported")
+        return self._get(ARRAY_TAGS[name]) or []
+
+    def deps(self, tag):
+        """ The dependencies in the format of rpm.ds DNEVR() without the type prefix """
+        prefix = tag[:-1]
+        names = self[prefix + 'name']
+        flags = self[prefix + 'flags']
+        versions = self[prefix + 'version']
+        deps = []
+        for dep, flag, evr in zip(names, flags, versions):
+            if flag & _SENSE_MASK:
+                dep += ' '
+                if flag & _SENSE_LESS:
+                    dep += '<'
+                if flag & _SENSE_GREATER:
+                    dep += '>'
+                if flag & _SENSE_EQUAL:
+                    dep += '='
+            if evr:
+                if not dep.endswith(' '):
+                    dep += ' '
+                dep += evr
+            deps.append(dep)
+        return deps
+
+
+# vim: sw=4 et
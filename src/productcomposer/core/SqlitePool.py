@@ -0,0 +1,259 @@
+""" Pool stored in a SQLite database
+
+"""
+
+import os
+import pathlib
+import sqlite3
+from operator import attrgetter
+
+from .Package import Package
+from .Pool import Pool
+from .evr import vercmp_key
+
+
+_evrkey = attrgetter('evrkey')
+
+
+class SqlitePoolError(Exception):
+    pass
+
+
+class SqlitePool(Pool):
+    """ Pool that keeps the packages in a SQLite database instead of memory
+
+    Package objects are only created for the results of a lookup. The
+    database can be reused by later runs, a scan only reads the rpms that
+    changed since the last one. Removed packages and the architectures of
+    a scan are not written to the database, they only apply to this pool.
+    """
+    # bump when the database layout changes
+    FORMAT = 1
+
+    _SCHEMA = f"""
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS rpms (
+            id INTEGER PRIMARY KEY,
+            seq INTEGER,
+            location TEXT UNIQUE,
+            origin TEXT,
+            size INTEGER,
+            mtime_ns INTEGER,
+            ino INTEGER,
+            {', '.join(Package.TAGS)},
+            provides TEXT,
+            requires TEXT,
+            vrkey TEXT
+        );
+        CREATE INDEX IF NOT EXISTS rpms_name ON rpms (name, arch);
+        CREATE INDEX IF NOT EXISTS rpms_arch ON rpms (arch);
+        CREATE INDEX IF NOT EXISTS rpms_sourcerpm ON rpms (sourcerpm);
+        CREATE INDEX IF NOT EXISTS rpms_nevra ON rpms (name, vrkey, arch);
+    """
+    _SELECT = f"SELECT location, origin, provides, requires, {', '.join(Package.TAGS)} FROM rpms"
+    _INSERT = (f"INSERT OR REPLACE INTO rpms (seq, location, origin, size, mtime_ns, ino, {', '.join(Package.TAGS)}, provides, requires, vrkey)"
+               f" VALUES ({', '.join('?' * (9 + len(Package.TAGS)))})")
+
+    def __init__(self, filename, readonly=False):
+        super().__init__()
+        self.filename = filename
+        self.readonly = readonly
+        if readonly:
+            uri = pathlib.Path(os.path.abspath(filename)).as_uri()
+            self.db = sqlite3.connect(f'{uri}?mode=ro', uri=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            self.db = sqlite3.connect(filename)
+        try:
+            self._setup()
+        except (SqlitePoolError, sqlite3.Error):
+            self.db.close()
+            raise
+        if not readonly:
+            # allow other runs to read the database while it is updated
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+        # locations of the packages removed with remove_rpms
+        self.removed = set()
+        # architectures of the last scan, None for all
+        self.arches = None
+        # whether the last scan used the repodata
+        self.use_repodata = False
+        # files added, changed and removed by the last scan
+        self.changes = None
+
+    def _setup(self):
+        """ Create the tables of a new database or one of an older format
+
+        Refuses any other database instead of dropping its tables, a read
+        only pool also refuses an older format.
+        """
+        tables = {row[0] for row in self.db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        dbformat = self._get_meta('format') if 'meta' in tables else None
+        if dbformat == str(SqlitePool.FORMAT):
+            return
+        if dbformat is None and (tables or self.readonly):
+            raise SqlitePoolError(f"{self.filename} is not a pool database")
+        if self.readonly:
+            raise SqlitePoolError(f"{self.filename} has the pool database format {dbformat}, expected {SqlitePool.FORMAT}")
+        with self.db:
+            if tables:
+                self.db.executescript("DROP TABLE IF EXISTS rpms; DELETE FROM meta;")
+            self.db.executescript(SqlitePool._SCHEMA)
+            self._set_meta('format', str(SqlitePool.FORMAT))
+
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self):
+        self.db.close()
+
+    def directory(self):
+        """ The directory of the last scan stored in the database, None if
+        the database was never filled """
+        return self._get_meta('directory')
+
+    @staticmethod
+    def _vrkey(version, release):
+        return repr((vercmp_key(version), vercmp_key(release)))
+
+    @staticmethod
+    def _split_deps(deps):
+        return tuple(deps.split('\n')) if deps else ()
+
+    def _filter(self, where, params):
+        """ Restrict a query to the architectures of the last scan """
+        if self.arches is None:
+            return (where, params)
+        where += f" AND arch IN ({', '.join('?' * len(self.arches))})"
+        return (where, params + tuple(sorted(self.arches)))
+
+    def _query(self, where, params=()):
+        """ The packages matching where in the order they were scanned """
+        (where, params) = self._filter(where, params)
+        pkgs = []
+        for row in self.db.execute(f"{SqlitePool._SELECT} WHERE {where} ORDER BY seq", params):
+            if row[0] in self.removed:
+                continue
+            pkg = self.make_rpm(row[0], cachedata=(row[4:], SqlitePool._split_deps(row[2]), SqlitePool._split_deps(row[3])))
+            pkg.origin = row[1]
+            pkgs.append(pkg)
+        return pkgs
+
+    def _insert(self, pkg, seq, origin, st=None):
+        (tags, provides, requires) = pkg.cachedata
+        stamp = (st.st_size, st.st_mtime_ns, st.st_ino) if st is not None else (None, None, None)
+        self.db.execute(SqlitePool._INSERT, (seq, pkg.location, origin, *stamp, *tags, '\n'.join(provides),
+                                             '\n'.join(requires), SqlitePool._vrkey(pkg.version, pkg.release)))
+
+    def add_rpm(self, pkg, origin=None):
+        self.lookup_cache.pop(pkg.name, None)
+        self.removed.discard(pkg.location)
+        with self.db:
+            seq = self.db.execute("SELECT COALESCE(MAX(seq), -1) + 1 FROM rpms").fetchone()[0]
+            self._insert(pkg, seq, origin)
+
+    def scan(self, directory, jobs=1, header_cache=None, use_repodata=False, arches=None):
+        """ Bring the database up to date with directory
+
+        The changes to the database are stored in the changes attribute
+        in the format of Pool.rescan.
+        """
+        directory = os.path.abspath(directory)
+        self.arches = None if arches is None else set(arches) | {'noarch', 'src', 'nosrc'}
+        self.use_repodata = use_repodata
+        self.removed = set()
+        self.lookup_cache = {}
+        self.updateinfos = {}
+        self._reindex_updates()
+        (state, repodata) = self._walk(directory, use_repodata, arches)
+        rpmfiles = []
+        stats = []
+        for fname, origin, st in Pool._state_files(directory, state):
+            if fname.endswith('updateinfo.xml'):
+                self.add_updateinfo(self.make_updateinfo(fname))
+            else:
+                rpmfiles.append((fname, origin))
+                stats.append(st)
+
+        changes = {'added': [], 'changed': [], 'removed': []}
+        with self.db:
+            if self._get_meta('directory') != directory:
+                self.db.execute("DELETE FROM rpms")
+                self._set_meta('directory', directory)
+            known = {row[0]: row[1:] for row in self.db.execute("SELECT location, id, seq, origin, arch, size, mtime_ns, ino FROM rpms")}
+
+            changed = []
+            updates = []
+            for seq, ((fname, origin), st) in enumerate(zip(rpmfiles, stats)):
+                entry = known.pop(fname, None)
+                if entry is None or entry[4:] != (st.st_size, st.st_mtime_ns, st.st_ino):
+                    changes['added' if entry is None else 'changed'].append(origin)
+                    changed.append(seq)
+                elif entry[1:3] != (seq, origin):
+                    updates.append((seq, origin, entry[0]))
+            self.db.executemany("UPDATE rpms SET seq = ?, origin = ? WHERE id = ?", updates)
+            # the packages of other architectures are kept for later scans
+            gone = [entry for entry in known.values() if self.arches is None or entry[3] in self.arches]
+            self.db.executemany("DELETE FROM rpms WHERE id = ?", [(entry[0],) for entry in gone])
+            changes['removed'] = [entry[2] for entry in gone]
+
+            for i, pkg in self._iter_rpms([rpmfiles[seq] for seq in changed], [stats[seq] for seq in changed],
+                                          jobs, header_cache, repodata):
+                seq = changed[i]
+                self._insert(pkg, seq, rpmfiles[seq][1], stats[seq])
+        self.changes = {change: sorted(origins) for change, origins in changes.items()}
+
+    def rescan(self, jobs=1, header_cache=None):
+        arches = None if self.arches is None else sorted(self.arches)
+        self.scan(self._get_meta('directory'), jobs, header_cache, self.use_repodata, arches)
+        return self.changes
+
+    def _rpm_lists(self, arch, name):
+        if arch is None:
+            lists = [self._query("name = ?", (name,))]
+        else:
+            lists = [self._query("name = ? AND arch = ?", (name, a)) for a in Pool._compatible_archs(arch)]
+        for rpms in lists:
+            # stable, so packages with the same evr stay in scan order
+            rpms.sort(key=_evrkey)
+        return [rpms for rpms in lists if rpms]
+
+    def lookup_nevra(self, arch, name, epoch, version, release):
+        vrkey = SqlitePool._vrkey(version, release)
+        rpms = []
+        for a in Pool._compatible_archs(arch):
+            rpms += self._query("name = ? AND vrkey = ? AND arch = ?", (name, vrkey, a))
+        if epoch is not None:
+            ekey = vercmp_key(epoch)
+            rpms = [rpm for rpm in rpms if rpm.evrkey[0] == ekey]
+        return Pool._best_rpm(rpms)
+
+    def lookup_sourcerpm_binary(self, sourcerpm, arch, name):
+        rpms = [rpm for rpm in self._query("sourcerpm = ? AND name = ?", (sourcerpm, name)) if Pool._arch_matches(rpm, arch)]
+        return Pool._best_rpm(rpms)
+
+    def lookup_product_cpeids(self, pkg):
+        return pkg.get_product_cpeid_provides()
+
+    def _drop_rpms(self, name, rpms):
+        self.lookup_cache.pop(name, None)
+        self.removed.update(rpm.location for rpm in rpms)
+
+    def names(self, arch=None):
+        where = "1"
+        params = ()
+        if arch is not None:
+            archs = Pool._compatible_archs(arch)
+            where = f"arch IN ({', '.join('?' * len(archs))})"
+            params = archs
+        (where, params) = self._filter(where, params)
+        if not self.removed:
+            return {row[0] for row in self.db.execute(f"SELECT DISTINCT name FROM rpms WHERE {where}", params)}
+        return {row[0] for row in self.db.execute(f"SELECT name, location FROM rpms WHERE {where}", params) if row[1] not in self.removed}
+
+# vim: sw=4 et
@@ -0,0 +1,48 @@
+""" Index of the updates of a pool
+
+"""
+
+
+class UpdateIndex:
+    """ The updates of all updateinfos of a pool, built once when the
+    updateinfos are added and shared by all build stages """
+    def __init__(self):
+        # (updateinfo, update) in the order they were added
+        self._entries = []
+        self._sorted = True
+        # update id -> [(updateinfo, update)]
+        self.byid = {}
+        # src path of a package -> updates that contain it
+        self.bysrc = {}
+
+    def add(self, uinfo):
+        if self._entries and uinfo.location < self._entries[-1][0].location:
+            self._sorted = False
+        for update in uinfo.updates:
+            self._entries.append((uinfo, update))
+            self.byid.setdefault(update.id, []).append((uinfo, update))
+            for pkg in update.packages:
+                self.bysrc.setdefault(pkg.src, []).append(update)
+
+    def entries(self):
+        """ All (updateinfo, update) tuples ordered by the updateinfo location """
+        if not self._sorted:
+            # stable, the updates of a file stay in file order
+            self._entries.sort(key=lambda entry: entry[0].location)
+            self._sorted = True
+        return self._entries
+
+    def exported(self):
+        """ The entries of the updates that end up in the product """
+        # internal updates are just used for tracking, eg. patchinfo.ga
+        return [(uinfo, update) for uinfo, update in self.entries() if update.type != '_internal']
+
+    def blocked(self):
+        """ The updates with a blocked_in_product element """
+        return [update for _, update in self.entries() if update.blocked]
+
+    def is_referenced(self, src):
+        """ Check if an exported update contains the package with the src path """
+        return any(update.type != '_internal' for update in self.bysrc.get(src, ()))
+
+# vim: sw=4 et
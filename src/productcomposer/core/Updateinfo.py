@@ -2,17 +2,61 @@
 
 """
 import functools
+import zlib
+from collections import namedtuple
 
 from xml.etree import ElementTree as ET
 
 
+# a package entry of an update
+UpdatePackage = namedtuple('UpdatePackage', ('name', 'epoch', 'version', 'release', 'arch', 'src'))
+
+
+class Update:
+    """ The fields of an update used by the composer, the element itself
+    is only kept as compressed xml """
+    __slots__ = ('id', 'type', 'blocked', 'packages', '_xml')
+
+    def __init__(self, element):
+        self.id = element.findtext('id')
+        self.type = element.get('type')
+        # an empty blocked_in_product element does not block the update
+        blocked = element.find('blocked_in_product')
+        self.blocked = blocked is not None and len(blocked) > 0
+        collection = element.find('pkglist/collection')
+        packages = collection.findall('package') if collection is not None else []
+        self.packages = tuple(UpdatePackage(*(p.get(tag) for tag in UpdatePackage._fields)) for p in packages)
+        element.tail = None
+        self._xml = zlib.compress(ET.tostring(element))
+
+    def element(self):
+        """ A new copy of the update element, it may be modified """
+        return ET.fromstring(zlib.decompress(self._xml))
+
+
 @functools.total_ordering
 class Updateinfo:
     def __init__(self, location=None):
+        self.updates = []
         if location is None:
             return
-        self.root = ET.parse(location).getroot()
         self.location = location
+        self._read(location)
+
+    def _read(self, location):
+        # stream the file, only one update element is in memory at a time
+        root = None
+        depth = 0
+        for event, elem in ET.iterparse(location, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and elem.tag == 'update':
+                self.updates.append(Update(elem))
+                root.clear()
 
     def __eq__(self, other):
         return self.location == other.location
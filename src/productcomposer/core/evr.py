@@ -0,0 +1,46 @@
+""" rpm version comparison keys
+
+The keys order like rpm.labelCompare, but are plain tuples that can be
+precomputed and compared with the native operators.
+
+"""
+
+import functools
+import re
+
+# the segments rpmvercmp looks at, everything else is a separator
+_segments_re = re.compile(r'~|\^|[0-9]+|[a-zA-Z]+')
+
+# segment ranks in rpmvercmp order: a tilde sorts before the end of the
+# string, a caret after it, and numbers sort after letters
+_TILDE = (0, 0)
+_END = (1, 0)
+_CARET = (2, 0)
+_ALPHA = 3
+_NUMERIC = 4
+
+
+@functools.lru_cache(maxsize=65536)
+def vercmp_key(s):
+    if s is None:
+        # a missing value sorts before everything else
+        return ()
+    key = []
+    for segment in _segments_re.findall(s):
+        if segment == '~':
+            key.append(_TILDE)
+        elif segment == '^':
+            key.append(_CARET)
+        elif segment[0].isdigit():
+            key.append((_NUMERIC, int(segment)))
+        else:
+            key.append((_ALPHA, segment))
+    key.append(_END)
+    return tuple(key)
+
+
+def evr_key(epoch, version, release):
+    # labelCompare treats a missing epoch as 0
+    return (vercmp_key(epoch if epoch is not None else '0'), vercmp_key(version), vercmp_key(release))
+
+# vim: sw=4 et
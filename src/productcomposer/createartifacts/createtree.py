@@ -17,7 +17,7 @@ from ..utils.report import (write_report_file)
 from ..utils.repomdutils import find_primary
 from ..wrappers import ModifyrepoWrapper
 
-def create_tree(outdir, product_base_dir, yml, pool, flavor, tree_report, supporstatus, supportstatus_override, eulas, vcs=None, disturl=None):
+def create_tree(outdir, product_base_dir, yml, pool, pkgsets, flavor, tree_report, supporstatus, supportstatus_override, eulas, vcs=None, disturl=None):
     if not os.path.exists(outdir):
         os.mkdir(outdir)
 
@@ -68,11 +68,11 @@ def create_tree(outdir, product_base_dir, yml, pool, flavor, tree_report, suppor
             # handle the special case for legacy x86 builds where some additional i686 rpms 
             # get added, but it is still handled as a single common i586 architecture.
             required_cpeid = None
-        link_rpms_to_tree(maindir, yml, pool, arch, flavor, tree_report, supporstatus, supportstatus_override, debugdir, sourcedir, required_cpeid)
+        link_rpms_to_tree(maindir, yml, pool, pkgsets, arch, flavor, tree_report, supporstatus, supportstatus_override, debugdir, sourcedir, required_cpeid)
 
     for arch in yml['architectures']:
         note(f"Unpack rpms for {arch}")
-        unpack_meta_rpms(maindir, yml, pool, arch, flavor, medium=1)  # only for first medium am
+        unpack_meta_rpms(maindir, yml, pool, pkgsets, arch, flavor, medium=1)  # only for first medium am
 
     repos = []
     if disturl:
@@ -177,13 +177,12 @@ def create_tree(outdir, product_base_dir, yml, pool, flavor, tree_report, suppor
 
     if 'skip_updateinfos' not in yml['build_options']:
         note("Processing updateinfo data")
+        targets = [None]
         if yml['repodata']:
-            if yml['repodata'] == 'all':
-                create_updateinfo_xml(maindir, yml, pool, flavor, debugdir, sourcedir)
-            for arch in yml['architectures']:
-                create_updateinfo_xml(maindir, yml, pool, flavor, debugdir, sourcedir, arch)
-        else:
-            create_updateinfo_xml(maindir, yml, pool, flavor, debugdir, sourcedir)
+            if yml['repodata'] != 'all':
+                targets = []
+            targets += yml['architectures']
+        create_updateinfo_xml(maindir, yml, pool, pkgsets, flavor, debugdir, sourcedir, targets, tree_report)
 
     # Add License File and create extra .license directory
     licensefilename = '/license.tar'
@@ -1,23 +1,124 @@
+import copy
+import io
 import os
 import re
 from datetime import datetime
+from operator import attrgetter
 from xml.etree import ElementTree as ET
-from ..utils.rpmutils import create_package_set
+
+import zstandard
+
 from ..utils.loggerutils import (note, warn, die)
 from ..core.PkgSet import PkgSet
 from ..core.Package import Package
 from ..wrappers import ModifyrepoWrapper
 from ..config import ET_ENCODING
 
-# create a fake package entry from an updateinfo package spec
-def create_updateinfo_package(pkgentry):
+# create a fake package entry from the key of an updateinfo package spec
+def create_updateinfo_package(key):
     entry = Package()
-    for tag in ('name', 'epoch', 'version', 'release', 'arch'):
-        setattr(entry, tag, pkgentry.get(tag))
+    for tag, value in zip(('name', 'epoch', 'version', 'release', 'arch'), key):
+        setattr(entry, tag, value)
     return entry
 
-# Add updateinfo.xml to metadata
-def create_updateinfo_xml(rpmdir, yml, pool, flavor, debugdir, sourcedir, archsubdir=None):
+# the key of a package entry when merging updates
+def updateinfo_package_key(pkgentry):
+    return tuple(pkgentry.get(tag) for tag in ('name', 'epoch', 'version', 'release', 'arch'))
+
+# canonical form of an element for comparing the content of updates,
+# ignores the attribute order and surrounding whitespace
+def element_fingerprint(element):
+    return (element.tag, tuple(sorted(element.attrib.items())), (element.text or '').strip(),
+            tuple(element_fingerprint(child) for child in element))
+
+def tree_has_file(tree_report, path):
+    if tree_report is None:
+        return os.path.exists(path)
+    return path in tree_report
+
+# the id of an update in the product
+def updateinfo_id(yml, update_id):
+    prefix = yml['set_updateinfo_id_prefix']
+    if len(prefix) > 0:
+        # avoid double application of same prefix
+        return prefix + re.sub(r'^' + prefix, '', update_id)
+    return update_id
+
+class UpdateinfoWriter:
+    """ Writes the updates of an updateinfo.xml one at a time
+
+    The file is created with the first update, compressed with zstd
+    when compress is set.
+    """
+    def __init__(self, filename, compress=False):
+        self.compress = compress
+        self.filename = filename + '.zst' if compress else filename
+        self.file = None
+
+    def write(self, update):
+        if self.file is None:
+            if self.compress:
+                writer = zstandard.ZstdCompressor().stream_writer(open(self.filename, 'xb'))
+                self.file = io.TextIOWrapper(writer, encoding='utf-8')
+            else:
+                self.file = open(self.filename, 'x')
+            self.file.write("<updates>\n  ")
+        update.tail = "\n  "
+        self.file.write(ET.tostring(update, encoding=ET_ENCODING))
+
+    def close(self):
+        """ Finish the file, returns False if no update was written """
+        if self.file is None:
+            return False
+        self.file.write("</updates>\n")
+        self.file.close()
+        self.file = None
+        return True
+
+# merge an update into the exported updates of a repodata directory
+def merge_update(export_updates, export_merge, update, parent):
+    update_id = update.find('id').text
+    if update_id in export_updates:
+        (fingerprints, export_keys, export_collection) = export_merge[update_id]
+        # same entry id, compare allmost all elements
+        for element in update:
+            if element.tag == 'pkglist':
+                # we merged it before
+                continue
+            if element.tag == 'issued':
+                # we accept a difference here
+                continue
+            # compare element effective result only
+            if element_fingerprint(element) != fingerprints.get(element.tag):
+                die(f"Error: updateinfos {update_id} differ in element {element.tag}")
+
+        if len(update) != len(export_updates[update_id]):
+            die(f"Error: updateinfos {update_id} have different amount of elements")
+
+        # entry already exists, we need to merge it
+        for pkgentry in parent.findall('package'):
+            key = updateinfo_package_key(pkgentry)
+            if key not in export_keys:
+                # add the pkgentry to existing element
+                export_keys.add(key)
+                export_collection.append(pkgentry)
+    else:
+        # new entry
+        export_updates[update_id] = update
+        fingerprints = {}
+        for element in update:
+            if element.tag not in ('pkglist', 'issued'):
+                # the first element of a tag, like find()
+                fingerprints.setdefault(element.tag, element_fingerprint(element))
+        export_keys = {updateinfo_package_key(pkgentry) for pkgentry in parent.findall('package')}
+        export_merge[update_id] = (fingerprints, export_keys, parent)
+
+# Add updateinfo.xml to metadata. The targets are the repodata directories
+# to create it for, None for the main one and an architecture for the
+# architecture specific ones. All are created with one pass over the
+# updates, the updates of the pool are not modified. The files are looked
+# up in the tree_report manifest if there is one.
+def create_updateinfo_xml(rpmdir, yml, pool, pkgsets, flavor, debugdir, sourcedir, targets=(None,), tree_report=None):
     if not pool.updateinfos:
         return
 
@@ -30,31 +131,47 @@ def create_updateinfo_xml(rpmdir, yml, pool, flavor, debugdir, sourcedir, archsu
     main_pkgset = PkgSet(None)
     for pkgset_name in yml['content']:
         for arch in yml['architectures']:
-            main_pkgset.add(create_package_set(yml, arch, flavor, pkgset_name, pool=pool))
+            main_pkgset.add(pkgsets.get(arch, flavor, pkgset_name))
 
     main_pkgset_names = main_pkgset.names()
     ###
 
-    uitemp = None
+    # group the updates by their id in the product, an update may be
+    # contained in more than one updateinfo
+    updates_byid = {}
+    last_updateinfo = None
+    for u, uentry in pool.update_index.exported():
+        if u is not last_updateinfo:
+            note("Add updateinfo " + u.location)
+            last_updateinfo = u
+        updates_byid.setdefault(updateinfo_id(yml, uentry.id), []).append(uentry)
 
-    archlist = yml['architectures']
-    subarchpath = ""
-    if archsubdir:
-        archlist = [archsubdir, "noarch"]
-        subarchpath = archsubdir + "/"
+    # join the packages of the updates against the package sets in one
+    # pass to find the ones we should have
+    update_packages = {}
+    for uentries in updates_byid.values():
+        for uentry in uentries:
+            for p in uentry.packages:
+                if p.name in main_pkgset_names:
+                    update_packages.setdefault(p.name, set()).add(p[:5])
+    update_lists = {name: [sorted(map(create_updateinfo_package, keys), key=attrgetter('evrkey'))]
+                    for name, keys in update_packages.items()}
+    wanted_update_packages = set()
+    for _, pkgs in pool.join_pkgset(main_pkgset, lambda name: update_lists.get(name, [])):
+        wanted_update_packages.update((pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch) for pkg in pkgs)
 
-    updateinfo_file = os.path.join(rpmdir, subarchpath, "updateinfo.xml")
+    compress = 'compress_updateinfo' in yml['build_options']
+    writers = {target: UpdateinfoWriter(os.path.join(rpmdir, target or '', "updateinfo.xml"), compress) for target in targets}
 
-    export_updates = {}
-    for u in sorted(pool.lookup_all_updateinfos()):
-        note("Add updateinfo " + u.location)
-        for update in u.root.findall('update'):
-            if update.get('type') == '_internal':
-                # just used for internal tracking, eg. patchinfo.ga
-                continue
-
-            needed = False
-            parent = update.findall('pkglist')[0].findall('collection')[0]
+    # merge and write one update id after the other in sorted order, so
+    # only the updates of one id are in memory
+    for update_id in sorted(updates_byid):
+        # target -> update id -> exported update
+        export_updates = {target: {} for target in targets}
+        # target -> update id -> element fingerprints, package keys and collection of the exported update
+        export_merge = {target: {} for target in targets}
+        for uentry in updates_byid[update_id]:
+            update = uentry.element()
 
             # drop OBS internal patchinforef element
             for pr in update.findall('patchinforef'):
@@ -64,18 +181,9 @@ def create_updateinfo_xml(rpmdir, yml, pool, flavor, debugdir, sourcedir, archsu
                 update.set('from', yml['set_updateinfo_from'])
 
             id_node = update.find('id')
-            if len(yml['set_updateinfo_id_prefix']) > 0:
-                # avoid double application of same prefix
-                id_text = re.sub(r'^' + yml['set_updateinfo_id_prefix'], '', id_node.text)
-                id_node.text = yml['set_updateinfo_id_prefix'] + id_text
-
-            for pkgentry in parent.findall('package'):
-                src = pkgentry.get('src')
-                if archsubdir:
-                    # former run might have prefixed already
-                    src = "../" + pkgentry.get('src').removeprefix("../")
-                    pkgentry.set('src', src)
+            id_node.text = update_id
 
+            for pkgentry in update.findall('pkglist')[0].findall('collection')[0].findall('package'):
                 # check for embargo date
                 embargo = pkgentry.get('embargo_date')
                 if embargo is not None:
@@ -97,99 +205,78 @@ def create_updateinfo_xml(rpmdir, yml, pool, flavor, debugdir, sourcedir, archsu
                 ):
                     pkgentry.attrib.pop(internal_attributes, None)
 
-                # check if we have files for the entry
-                if os.path.exists(rpmdir + '/' + subarchpath + src):
-                    needed = True
-                    continue
-                if debugdir and os.path.exists(debugdir + '/' + src):
-                    needed = True
-                    continue
-                if sourcedir and os.path.exists(sourcedir + '/' + src):
-                    needed = True
-                    continue
-                name = pkgentry.get('name')
-                pkgarch = pkgentry.get('arch')
+            for target in targets:
+                # every target gets its own copy of the update
+                target_update = copy.deepcopy(update) if len(targets) > 1 else update
+                archlist = yml['architectures']
+                subarchpath = ""
+                if target:
+                    archlist = [target, "noarch"]
+                    subarchpath = target + "/"
 
-                # do not insist on debuginfo or source packages
-                if pkgarch == 'src' or pkgarch == 'nosrc':
-                    parent.remove(pkgentry)
-                    continue
-                if name.endswith('-debuginfo') or name.endswith('-debugsource'):
-                    parent.remove(pkgentry)
-                    continue
-                # ignore unwanted architectures
-                if pkgarch != 'noarch' and pkgarch not in archlist:
-                    parent.remove(pkgentry)
-                    continue
+                needed = False
+                parent = target_update.findall('pkglist')[0].findall('collection')[0]
+                for pkgentry in parent.findall('package'):
+                    src = pkgentry.get('src')
+                    if target:
+                        src = "../" + src
+                        pkgentry.set('src', src)
+
+                    # check if we have files for the entry
+                    if tree_has_file(tree_report, rpmdir + '/' + subarchpath + src):
+                        needed = True
+                        continue
+                    if debugdir and tree_has_file(tree_report, debugdir + '/' + src):
+                        needed = True
+                        continue
+                    if sourcedir and tree_has_file(tree_report, sourcedir + '/' + src):
+                        needed = True
+                        continue
+                    name = pkgentry.get('name')
+                    pkgarch = pkgentry.get('arch')
 
-                # check if we should have this package
-                if name in main_pkgset_names and not archsubdir:
-                    updatepkg = create_updateinfo_package(pkgentry)
-                    if main_pkgset.matchespkg(None, updatepkg):
-                        warn(f"package {updatepkg} not found")
+                    # do not insist on debuginfo or source packages
+                    if pkgarch == 'src' or pkgarch == 'nosrc':
+                        parent.remove(pkgentry)
+                        continue
+                    if name.endswith('-debuginfo') or name.endswith('-debugsource'):
+                        parent.remove(pkgentry)
+                        continue
+                    # ignore unwanted architectures
+                    if pkgarch != 'noarch' and pkgarch not in archlist:
+                        parent.remove(pkgentry)
+                        continue
+
+                    # check if we should have this package
+                    key = updateinfo_package_key(pkgentry)
+                    if key in wanted_update_packages and not target:
+                        warn(f"package {create_updateinfo_package(key)} not found")
                         missing_package = True
 
-                parent.remove(pkgentry)
+                    parent.remove(pkgentry)
 
-            if not needed:
-                if 'abort_on_empty_updateinfo' in yml['build_options']:
-                    die(f'Stumbled over an updateinfo.xml where no rpm is used: {id_node.text}')
-                continue
+                if not needed:
+                    if 'abort_on_empty_updateinfo' in yml['build_options']:
+                        die(f'Stumbled over an updateinfo.xml where no rpm is used: {id_node.text}')
+                    continue
 
-            update_id = update.find('id').text
-            if update_id in export_updates:
-                # same entry id, compare allmost all elements
-                for element in update:
-                    if element.tag == 'pkglist':
-                        # we merged it before
-                        continue
-                    if element.tag == 'issued':
-                        # we accept a difference here
-                        continue
-                    # compare element effective result only
-                    if ET.tostring(element) != ET.tostring(export_updates[update_id].find(element.tag)):
-                        die(f"Error: updateinfos {update_id} differ in element {element.tag}")
-
-                if len(update) != len(export_updates[update_id]):
-                    die(f"Error: updateinfos {update_id} have different amount of elements")
-
-                # entry already exists, we need to merge it
-                export_collection = export_updates[update_id].findall('pkglist')[0].findall('collection')[0]
-                collection = update.findall('pkglist')[0].findall('collection')[0]
-                for pkgentry in collection.findall('package'):
-                    for existing_entry in export_collection.findall('package'):
-                        if existing_entry.get('name') != pkgentry.get('name'):
-                            continue
-                        if existing_entry.get('epoch') != pkgentry.get('epoch'):
-                            continue
-                        if existing_entry.get('version') != pkgentry.get('version'):
-                            continue
-                        if existing_entry.get('release') != pkgentry.get('release'):
-                            continue
-                        if existing_entry.get('arch') != pkgentry.get('arch'):
-                            continue
-                        break    # same entry exists, so break for skipping the else part
-                    else:
-                        # add the pkgentry to existing element
-                        export_collection.append(pkgentry)
-            else:
-                # new entry
-                export_updates[update_id] = update
+                merge_update(export_updates[target], export_merge[target], target_update, parent)
 
-    if export_updates:
-        uitemp = open(updateinfo_file, 'x')
-        uitemp.write("<updates>\n  ")
-        for update in sorted(export_updates):
-            uitemp.write(ET.tostring(export_updates[update], encoding=ET_ENCODING))
-        uitemp.write("</updates>\n")
-        uitemp.close()
+        for target in targets:
+            if update_id in export_updates[target]:
+                writers[target].write(export_updates[target][update_id])
 
+    for target, writer in writers.items():
+        if not writer.close():
+            continue
         mr = ModifyrepoWrapper(
-                file=updateinfo_file,
-                directory=os.path.join(rpmdir, subarchpath, "repodata"))
+                file=writer.filename,
+                directory=os.path.join(rpmdir, target or '', "repodata"),
+                compress=not writer.compress,
+                mdtype='updateinfo')
         mr.run_cmd()
 
-        os.unlink(updateinfo_file)
+        os.unlink(writer.filename)
 
     if missing_package and 'ignore_missing_packages' not in yml['build_options']:
         die('Abort due to missing packages for updateinfo')
@@ -1,7 +1,75 @@
+import gzip
 from xml.etree import ElementTree as ET
 
+import zstandard
+
+COMMON_NS = '{http://linux.duke.edu/metadata/common}'
+RPM_NS = '{http://linux.duke.edu/metadata/rpm}'
+
+# dependency flags in rpm-md to rpm sense strings
+_DEP_FLAGS = {'EQ': '=', 'LT': '<', 'GT': '>', 'LE': '<=', 'GE': '>='}
+
 # get the file name from repomd.xml
 def find_primary(directory):
     ns = '{http://linux.duke.edu/metadata/repo}'
     tree = ET.parse(directory + '/repodata/repomd.xml')
-    return directory + '/' + tree.find(f".//{ns}data[@type='primary']/{ns}location").get('href')
\ No newline at end of file
+    return directory + '/' + tree.find(f".//{ns}data[@type='primary']/{ns}location").get('href')
+
+def open_repomd_file(filename):
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    if filename.endswith('.zst'):
+        return zstandard.open(filename, 'rb')
+    return open(filename, 'rb')
+
+def _primary_deps(fmt, tag):
+    deps = []
+    parent = fmt.find(RPM_NS + tag)
+    if parent is None:
+        return deps
+    for entry in parent.findall(RPM_NS + 'entry'):
+        # the format of rpm.ds DNEVR() without the type prefix
+        dep = entry.get('name')
+        flags = entry.get('flags')
+        if flags:
+            dep += ' ' + _DEP_FLAGS[flags]
+        ver = entry.get('ver')
+        if ver:
+            evr = ver
+            if entry.get('epoch', '0') != '0':
+                evr = entry.get('epoch') + ':' + evr
+            if entry.get('rel'):
+                evr += '-' + entry.get('rel')
+            dep += ' ' + evr
+        deps.append(dep)
+    return deps
+
+# stream the rpm packages of the primary metadata of a repository
+def iter_primary_packages(directory):
+    with open_repomd_file(find_primary(directory)) as f:
+        root = None
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if root is None:
+                root = elem
+            if event != 'end' or elem.tag != COMMON_NS + 'package':
+                continue
+            if elem.get('type') == 'rpm' and elem.find(COMMON_NS + 'location').get('{http://www.w3.org/XML/1998/namespace}base') is None:
+                version = elem.find(COMMON_NS + 'version')
+                fmt = elem.find(COMMON_NS + 'format')
+                yield {
+                    'location': elem.find(COMMON_NS + 'location').get('href'),
+                    'size': int(elem.find(COMMON_NS + 'size').get('package')),
+                    'filetime': int(elem.find(COMMON_NS + 'time').get('file')),
+                    'name': elem.find(COMMON_NS + 'name').text,
+                    'epoch': version.get('epoch') or '0',
+                    'version': version.get('ver'),
+                    'release': version.get('rel'),
+                    'arch': elem.find(COMMON_NS + 'arch').text,
+                    'sourcerpm': fmt.findtext(RPM_NS + 'sourcerpm') or None,
+                    'buildtime': int(elem.find(COMMON_NS + 'time').get('build')),
+                    'license': fmt.findtext(RPM_NS + 'license') or None,
+                    'provides': _primary_deps(fmt, 'provides'),
+                    'requires': _primary_deps(fmt, 'requires'),
+                }
+            # we only need one package element at a time
+            root.clear()
@@ -1,17 +1,33 @@
+import os
 from xml.etree import ElementTree as ET
 
-def add_entry_to_report(tree_report, entry, outname):
-    # first one wins, see link_file_into_dir
-    if outname not in tree_report:
-        tree_report[outname] = entry
+
+class TreeManifest:
+    """ The files linked into the work directories
+
+    Later stages query it instead of probing the output directories.
+    """
+    def __init__(self):
+        # normalized path -> package, None for files without a package
+        self.files = {}
+        # directories known to exist
+        self.directories = set()
+
+    def add(self, path, entry=None):
+        # first one wins, see link_file_into_dir
+        self.files.setdefault(os.path.normpath(path), entry)
+
+    def __contains__(self, path):
+        return os.path.normpath(path) in self.files
+
+    def packages(self, directory):
+        """ The sorted (path, package) tuples of the rpms below directory """
+        prefix = os.path.join(os.path.normpath(directory), '')
+        return [(fn, entry) for fn, entry in sorted(self.files.items()) if entry is not None and fn.startswith(prefix)]
 
 def write_report_file(tree_report, directory, outfile):
     root = ET.Element('report')
-    if not directory.endswith('/'):
-        directory += '/'
-    for fn, entry in sorted(tree_report.items()):
-        if not fn.startswith(directory):
-            continue
+    for fn, entry in tree_report.packages(directory):
         binary = ET.SubElement(root, 'binary')
         binary.text = 'obs://' + entry.origin
         for tag in (
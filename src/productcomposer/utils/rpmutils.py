@@ -5,7 +5,6 @@ import urllib.parse
 
 from ..core.PkgSet import PkgSet
 from ..utils.loggerutils import die, note, warn
-from ..utils.report import add_entry_to_report
 from ..utils.runhelper import run_helper
 
 
@@ -31,29 +30,79 @@ def filter_pkgsets(yml, arch, flavor):
         pkgsets_raw[name] = entry
     return pkgsets_raw
 
-def create_package_set_cached(yml, arch, flavor, setname, pkgsetcache, pkgsets_rawcache, pool=None):
+# split the arch/flavor overwrites from a package set reference, None if
+# there is no overwrite
+def split_package_set_name(setname):
+    m = re.fullmatch(r'(\S+)(?:\s+architecture=(\S+))?(?:\s+flavor=(\S*))?(?:\s+architecture=(\S+))?\s*', setname)
+    if not m:
+        return (setname, None, None)
+    return (m[1], m[4] or m[2] or None, m[3] or None)
+
+# compile the package sets into a graph and find out which ones depend on
+# the architecture and the flavor, either by their own filters or by the
+# package sets they use. Returns name -> (arch dependent, flavor dependent)
+def package_set_dependencies(yml):
+    entries = {}
+    for entry in yml['packagesets']:
+        entries.setdefault(entry['name'] if 'name' in entry else 'main', []).append(entry)
+
+    dependencies = {'__all__': (True, False)}
+
+    def visit(name):
+        if name in dependencies:
+            return dependencies[name]
+        # a cycle is reported when evaluating, assume the worst here
+        dependencies[name] = (True, True)
+        arch_dep = any(entry['architectures'] for entry in entries.get(name, []))
+        flavor_dep = any(entry['flavors'] for entry in entries.get(name, []))
+        for entry in entries.get(name, []):
+            for setop in 'add', 'sub', 'intersect':
+                for oname in entry.get(setop) or []:
+                    (oname, oarch, oflavor) = split_package_set_name(oname)
+                    (oarch_dep, oflavor_dep) = visit(oname)
+                    arch_dep = arch_dep or (oarch_dep and oarch is None)
+                    flavor_dep = flavor_dep or (oflavor_dep and oflavor is None)
+        dependencies[name] = (arch_dep, flavor_dep)
+        return dependencies[name]
+
+    for name in entries:
+        visit(name)
+    return dependencies
+
+def create_package_set_cached(yml, arch, flavor, setname, pkgsetcache, pkgsets_rawcache, pool=None, stats=None, dependencies=None):
     if flavor is None:
         flavor = ''
 
     # process arch/flavor overwrites
-    m = re.fullmatch(r'(\S+)(?:\s+architecture=(\S+))?(?:\s+flavor=(\S*))?(?:\s+architecture=(\S+))?\s*', setname)
-    if m:
-        setname = m[1]
-        arch = m[4] or m[2] or arch
-        flavor = m[3] or flavor
+    (setname, oarch, oflavor) = split_package_set_name(setname)
+    arch = oarch or arch
+    flavor = oflavor or flavor
 
     if setname == '__all__':
         setkey = f"{setname}/{arch}"
         if not pkgsetcache.get(setkey):
             pkgsetcache[setkey] = create_package_set_all(setname, pool, arch)
+            if stats is not None:
+                stats['evaluated'] += 1
+        elif stats is not None:
+            stats['cached'] += 1
         return pkgsetcache[setkey]
 
     setkey = f"{setname}/{arch}/{flavor}"
+    if dependencies is not None and setname in dependencies:
+        # share the package set between the architectures and flavors it
+        # does not depend on
+        (arch_dep, flavor_dep) = dependencies[setname]
+        setkey = f"{setname}/{arch if arch_dep else '*'}/{flavor if flavor_dep else '*'}"
     if setkey in pkgsetcache:
         if not pkgsetcache[setkey]:
             die(f"cyclic definition of package set '{setname}'")
+        if stats is not None:
+            stats['cached'] += 1
         return pkgsetcache[setkey]
     pkgsetcache[setkey] = None  # mark as in progress for cycle detection
+    if stats is not None:
+        stats['evaluated'] += 1
 
     rawcachekey = f"{arch}/{flavor}"
     pkgsets_raw = pkgsets_rawcache.get(rawcachekey)
@@ -82,7 +131,8 @@ def create_package_set_cached(yml, arch, flavor, setname, pkgsetcache, pkgsets_r
         if entry.get(setop) is None:
             continue
         for oname in entry[setop]:
-            opkgset = create_package_set_cached(yml, arch, flavor, oname, pkgsetcache, pkgsets_rawcache, pool=pool)
+            opkgset = create_package_set_cached(yml, arch, flavor, oname, pkgsetcache, pkgsets_rawcache, pool=pool, stats=stats,
+                                                dependencies=dependencies)
             match setop:
                 case 'add':
                     pkgset.add(opkgset)
@@ -95,36 +145,75 @@ def create_package_set_cached(yml, arch, flavor, setname, pkgsetcache, pkgsets_r
     pkgsetcache[setkey] = pkgset
     return pkgset
 
-def create_package_set(yml, arch, flavor, setname, pool=None):
-    return create_package_set_cached(yml, arch, flavor, setname, {}, {}, pool=pool)
+class PkgSetResolver:
+    """ Evaluates the package sets of a build description
+
+    The package sets are cached for the whole run, so the pool must not
+    change anymore. A package set that does not depend on the architecture
+    or the flavor is evaluated once for all of them. The returned package
+    sets are shared and must not be modified.
+    """
+    def __init__(self, yml, pool=None):
+        self.yml = yml
+        self.pool = pool
+        self.pkgsetcache = {}
+        self.pkgsets_rawcache = {}
+        self.dependencies = package_set_dependencies(yml)
+        # package sets evaluated and taken from the cache, including the
+        # ones referenced by other package sets
+        self.stats = {'evaluated': 0, 'cached': 0}
+
+    def get(self, arch, flavor, setname):
+        # check the definitions for this architecture and flavor even if
+        # the package set comes from the cache
+        rawcachekey = f"{arch}/{flavor or ''}"
+        if rawcachekey not in self.pkgsets_rawcache:
+            self.pkgsets_rawcache[rawcachekey] = filter_pkgsets(self.yml, arch, flavor or '')
+        return create_package_set_cached(self.yml, arch, flavor, setname, self.pkgsetcache, self.pkgsets_rawcache,
+                                         pool=self.pool, stats=self.stats, dependencies=self.dependencies)
 
+def create_package_set(yml, arch, flavor, setname, pool=None):
+    """ Evaluate a single package set, use PkgSetResolver for several """
+    return PkgSetResolver(yml, pool).get(arch, flavor, setname)
 
-def link_file_into_dir(source, directory, name=None):
-    if not os.path.exists(directory):
-        os.mkdir(directory)
+def link_file_into_dir(source, directory, name=None, tree_report=None, entry=None):
     if name is None:
         name = os.path.basename(source)
     outname = directory + '/' + name
-    if not os.path.exists(outname):
+    if tree_report is not None and outname in tree_report:
+        return
+    if tree_report is None or directory not in tree_report.directories:
+        try:
+            os.mkdir(directory)
+        except FileExistsError:
+            pass
+        if tree_report is not None:
+            tree_report.directories.add(directory)
+    try:
         if os.path.islink(source):
             # osc creates a repos/ structure with symlinks to it's cache
             # but these would point outside of our media
-            shutil.copyfile(source, outname)
+            with open(source, 'rb') as fsrc, open(outname, 'xb') as fdst:
+                shutil.copyfileobj(fsrc, fdst)
         else:
             os.link(source, outname)
+    except FileExistsError:
+        # already placed by something else, eg. an unpacked meta rpm
+        pass
+    if tree_report is not None:
+        tree_report.add(outname, entry)
 
 
 def link_entry_into_dir(tree_report, entry, directory, add_slsa=False):
     canonfilename = entry.canonfilename
     outname = directory + '/' + entry.arch + '/' + canonfilename
-    if not os.path.exists(outname):
-        link_file_into_dir(entry.location, directory + '/' + entry.arch, name=canonfilename)
-        add_entry_to_report(tree_report, entry, outname)
+    if outname not in tree_report:
+        link_file_into_dir(entry.location, directory + '/' + entry.arch, name=canonfilename, tree_report=tree_report, entry=entry)
         if add_slsa:
             slsalocation = entry.location.removesuffix('.rpm') + '.slsa_provenance.json'
             if os.path.exists(slsalocation):
                 slsaname = canonfilename.removesuffix('.rpm') + '.slsa_provenance.json'
-                link_file_into_dir(slsalocation, directory + '/' + entry.arch, name=slsaname)
+                link_file_into_dir(slsalocation, directory + '/' + entry.arch, name=slsaname, tree_report=tree_report)
 
 def unpack_one_meta_rpm(rpmdir, rpm, medium):
     tempdir = rpmdir + "/temp"
@@ -136,10 +225,10 @@ def unpack_one_meta_rpm(rpmdir, rpm, medium):
         shutil.copytree(skel_dir, rpmdir, dirs_exist_ok=True)
     shutil.rmtree(tempdir)
 
-def unpack_meta_rpms(rpmdir, yml, pool, arch, flavor, medium):
+def unpack_meta_rpms(rpmdir, yml, pool, pkgsets, arch, flavor, medium):
     missing_package = False
     for unpack_pkgset_name in yml.get('unpack', []):
-        unpack_pkgset = create_package_set(yml, arch, flavor, unpack_pkgset_name, pool=pool)
+        unpack_pkgset = pkgsets.get(arch, flavor, unpack_pkgset_name)
         for sel in unpack_pkgset:
             rpm = pool.lookup_rpm(arch, sel.name, sel.op, sel.epoch, sel.version, sel.release)
             if not rpm:
@@ -151,7 +240,7 @@ def unpack_meta_rpms(rpmdir, yml, pool, arch, flavor, medium):
     if missing_package and 'ignore_missing_packages' not in yml['build_options']:
         die('Abort due to missing meta packages')
 
-def link_rpms_to_tree(rpmdir, yml, pool, arch, flavor, tree_report, supportstatus, supportstatus_override, debugdir=None, sourcedir=None, cpeid=None):
+def link_rpms_to_tree(rpmdir, yml, pool, pkgsets, arch, flavor, tree_report, supportstatus, supportstatus_override, debugdir=None, sourcedir=None, cpeid=None):
     singlemode = True
     if 'take_all_available_versions' in yml['build_options']:
         singlemode = False
@@ -159,44 +248,29 @@ def link_rpms_to_tree(rpmdir, yml, pool, arch, flavor, tree_report, supportstatu
     if 'add_slsa_provenance' in yml['build_options']:
         add_slsa = True
 
-    referenced_update_rpms = None
+    update_index = None
     if 'updateinfo_packages_only' in yml['build_options']:
         if not pool.updateinfos:
             warn("filtering for updates enabled, but no updateinfo found")
         if singlemode:
             die("filtering for updates enabled, but take_all_available_versions is not set")
 
-        referenced_update_rpms = {}
-        for u in sorted(pool.lookup_all_updateinfos()):
-            for update in u.root.findall('update'):
-                if update.get('type') == '_internal':
-                    # just used for internal tracking, eg. patchinfo.ga
-                    continue
-
-                parent = update.findall('pkglist')[0].findall('collection')[0]
-                for pkgentry in parent.findall('package'):
-                    referenced_update_rpms[pkgentry.get('src')] = 1
+        update_index = pool.update_index
 
     ### This needs to be kept in sync with src/productcomposer/createartifacts/createupdateinfoxml.py
     ### or factored out
     main_pkgset = PkgSet(None)
     for pkgset_name in yml['content']:
-        main_pkgset.add(create_package_set(yml, arch, flavor, pkgset_name, pool=pool))
+        main_pkgset.add(pkgsets.get(arch, flavor, pkgset_name))
     ###
 
     missing_package = None
     found_matching_cpeid = None
     empty_medium = True
     note("Linking all rpms")
-    for sel in main_pkgset:
-        if singlemode:
-            rpm = pool.lookup_rpm(arch, sel.name, sel.op, sel.epoch, sel.version, sel.release)
-            rpms = [rpm] if rpm else []
-        else:
-            rpms = pool.lookup_all_rpms(arch, sel.name, sel.op, sel.epoch, sel.version, sel.release)
-
+    for sel, rpms in pool.resolve_pkgset(arch, main_pkgset, all_versions=not singlemode):
         if not rpms:
-            if referenced_update_rpms is not None:
+            if update_index is not None:
                 continue
             warn(f"package {sel} not found for {arch}")
             missing_package = True
@@ -204,8 +278,8 @@ def link_rpms_to_tree(rpmdir, yml, pool, arch, flavor, tree_report, supportstatu
 
         empty_medium = False
         for rpm in rpms:
-            if referenced_update_rpms is not None:
-                if (rpm.arch + '/' + rpm.canonfilename) not in referenced_update_rpms:
+            if update_index is not None:
+                if not update_index.is_referenced(rpm.arch + '/' + rpm.canonfilename):
                     note(f"No update for {rpm}")
                     continue
 
@@ -221,19 +295,18 @@ def link_rpms_to_tree(rpmdir, yml, pool, arch, flavor, tree_report, supportstatu
                 continue
 
             if cpeid:
-                for provide in rpm.provides:
-                    if provide.startswith('product-cpeid() = '):
-                        cpeid_provided = urllib.parse.unquote_plus(provide.removeprefix('product-cpeid() = '))
-                        if 'no_product_provides' in yml['build_options']:
-                            die(f"no_product_provides option is set, but product {cpeid_provided} is provided by {rpm.canonfilename}")
-                        if cpeid != cpeid_provided:
-                            warn(f"rpm package {rpm} provides an additional cpeid: {cpeid_provided}")
-                        else:
-                            found_matching_cpeid = True
+                for provide in pool.lookup_product_cpeids(rpm):
+                    cpeid_provided = urllib.parse.unquote_plus(provide)
+                    if 'no_product_provides' in yml['build_options']:
+                        die(f"no_product_provides option is set, but product {cpeid_provided} is provided by {rpm.canonfilename}")
+                    if cpeid != cpeid_provided:
+                        warn(f"rpm package {rpm} provides an additional cpeid: {cpeid_provided}")
+                    else:
+                        found_matching_cpeid = True
 
             if sourcedir:
                 # so we need to add also the src rpm
-                srpm = pool.lookup_rpm(srcrpm.arch, srcrpm.name, '=', None, srcrpm.version, srcrpm.release)
+                srpm = pool.lookup_nevra(srcrpm.arch, srcrpm.name, None, srcrpm.version, srcrpm.release)
                 if srpm:
                     link_entry_into_dir(tree_report, srpm, sourcedir, add_slsa=add_slsa)
                 else:
@@ -242,18 +315,18 @@ def link_rpms_to_tree(rpmdir, yml, pool, arch, flavor, tree_report, supportstatu
 
             if debugdir:
                 # the debug source package
-                drpm = pool.lookup_rpm(arch, srcrpm.name + "-debugsource", '=', None, srcrpm.version, srcrpm.release)
+                drpm = pool.lookup_sourcerpm_binary(rpm.sourcerpm, arch, srcrpm.name + "-debugsource")
                 if drpm:
                     link_entry_into_dir(tree_report, drpm, debugdir, add_slsa=add_slsa)
 
                 # the debuginfo based on the src.rpm name
                 # Since the dwz implementation we may have them without actually having the main package.
-                drpm = pool.lookup_rpm(arch, srcrpm.name + "-debuginfo", '=', None, srcrpm.version, srcrpm.release)
+                drpm = pool.lookup_sourcerpm_binary(rpm.sourcerpm, arch, srcrpm.name + "-debuginfo")
                 if drpm:
                     link_entry_into_dir(tree_report, drpm, debugdir, add_slsa=add_slsa)
 
                 # the normal debuginfo package for a package which we have on the medium.
-                drpm = pool.lookup_rpm(arch, rpm.name + "-debuginfo", '=', rpm.epoch, rpm.version, rpm.release)
+                drpm = pool.lookup_nevra(arch, rpm.name + "-debuginfo", rpm.epoch, rpm.version, rpm.release)
                 if drpm:
                     link_entry_into_dir(tree_report, drpm, debugdir, add_slsa=add_slsa)
 
@@ -55,6 +55,7 @@ compose_schema_build_option = Literal[
     'add_slsa_provenance',
     'base_skip_packages',
     'block_updates_under_embargo',
+    'compress_updateinfo',
     'hide_flavor_in_product_directory_name',
     'ignore_missing_packages',
     'no_product_provides',
@@ -0,0 +1,32 @@
+""" Compare the mmap header reader against librpm
+
+Usage: python tests/benchmarks/bench_rpmheader.py RPM...
+
+"""
+
+import sys
+import time
+
+from productcomposer.core.Package import Package
+
+
+def benchmark(locations):
+    for reader in ('librpm', 'mmap'):
+        Package.header_reader = reader
+        rpm_ts = Package.create_rpm_ts()
+        start = time.perf_counter()
+        pkgs = [Package(location, rpm_ts=rpm_ts) for location in locations]
+        for pkg in pkgs:
+            pkg.get_directories()
+        elapsed = time.perf_counter() - start
+        print(f"{reader}: {len(pkgs)} rpms in {elapsed:.3f}s")
+        if reader == 'librpm':
+            expected = [(pkg.cachedata, pkg.get_directories()) for pkg in pkgs]
+        elif expected != [(pkg.cachedata, pkg.get_directories()) for pkg in pkgs]:
+            print("results differ")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(benchmark(sys.argv[1:]))
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('rpm')
+
+from productcomposer.commands.verify import VerifyCommand  # noqa: E402
+from productcomposer.core.SqlitePool import SqlitePool  # noqa: E402
+
+
+def test_open_pool_db(tmp_path):
+    dbfile = str(tmp_path / 'pool.db')
+    with pytest.raises(SystemExit):
+        VerifyCommand.open_pool_db(dbfile)
+    assert not (tmp_path / 'pool.db').exists()
+
+    # an empty database
+    SqlitePool(dbfile).close()
+    with pytest.raises(SystemExit):
+        VerifyCommand.open_pool_db(dbfile)
+
+    (tmp_path / 'repos').mkdir()
+    pool = SqlitePool(dbfile)
+    pool.scan(str(tmp_path / 'repos'))
+    pool.close()
+    pool = VerifyCommand.open_pool_db(dbfile)
+    assert pool.directory() == str(tmp_path / 'repos')
+    pool.close()
+
+    (tmp_path / 'broken.db').write_bytes(b'not a database' * 100)
+    with pytest.raises(SystemExit):
+        VerifyCommand.open_pool_db(str(tmp_path / 'broken.db'))
+
+    # a foreign database is refused and left alone
+    db = sqlite3.connect(str(tmp_path / 'other.db'))
+    with db:
+        db.execute("CREATE TABLE meta (name TEXT)")
+    db.close()
+    with pytest.raises(SystemExit):
+        VerifyCommand.open_pool_db(str(tmp_path / 'other.db'))
+    db = sqlite3.connect(str(tmp_path / 'other.db'))
+    assert db.execute("SELECT sql FROM sqlite_master").fetchall() == [('CREATE TABLE meta (name TEXT)',)]
+    db.close()
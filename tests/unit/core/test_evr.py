@@ -0,0 +1,55 @@
+import pytest
+
+from productcomposer.core.evr import evr_key, vercmp_key
+
+
+def _cmp(a, b):
+    return (a > b) - (a < b)
+
+
+# taken from the rpmvercmp test cases of rpm
+@pytest.mark.parametrize('v1, v2, expected', [
+    ('1.0', '1.0', 0),
+    ('1.0', '2.0', -1),
+    ('2.0.1', '2.0', 1),
+    ('2.0.1a', '2.0.1', 1),
+    ('5.5p1', '5.5p10', -1),
+    ('10xyz', '10.1xyz', -1),
+    ('xyz10', 'xyz10.1', -1),
+    ('xyz.4', '8', -1),
+    ('xyz.4', '2', -1),
+    ('5.6p1', '5.5p2', 1),
+    ('6.0.rc1', '6.0', 1),
+    ('10b2', '10a1', 1),
+    ('1.0a', '1.0aa', -1),
+    ('10.0001', '10.1', 0),
+    ('10.0001', '10.0039', -1),
+    ('4.999.9', '5.0', -1),
+    ('20101121', '20101122', -1),
+    ('2.0', '2_0', 0),
+    ('a+', 'a_', 0),
+    ('+_', '_+', 0),
+    ('+', '_', 0),
+    ('1.0~rc1', '1.0', -1),
+    ('1.0~rc1', '1.0~rc2', -1),
+    ('1.0~rc1~git123', '1.0~rc1', -1),
+    ('1.0^', '1.0', 1),
+    ('1.0^git1', '1.0', 1),
+    ('1.0^git1', '1.0^git2', -1),
+    ('1.0^git1', '1.01', -1),
+    ('1.0^20160101', '1.0.1', -1),
+    ('1.0^20160102', '1.0^20160101^git1', 1),
+    ('1.0~rc1^git1', '1.0~rc1', 1),
+    ('1.0^git1', '1.0^git1~pre', 1),
+])
+def test_vercmp_key(v1, v2, expected):
+    assert _cmp(vercmp_key(v1), vercmp_key(v2)) == expected
+    assert _cmp(vercmp_key(v2), vercmp_key(v1)) == -expected
+
+
+def test_evr_key():
+    assert evr_key(None, '1.0', '1') == evr_key('0', '1.0', '1')
+    assert evr_key('1', '1.0', '1') > evr_key('0', '2.0', '1')
+    assert evr_key('0', '1.0', '2') > evr_key('0', '1.0', '1')
+    # a missing release sorts before any release
+    assert evr_key('0', '1.0', None) < evr_key('0', '1.0', '')
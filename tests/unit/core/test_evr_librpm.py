@@ -0,0 +1,59 @@
+import pytest
+
+rpm = pytest.importorskip('rpm')
+hypothesis = pytest.importorskip('hypothesis')
+
+from hypothesis import given  # noqa: E402
+from hypothesis import strategies as st  # noqa: E402
+
+from productcomposer.core.Package import Package  # noqa: E402
+from productcomposer.core.PkgSelect import PkgSelect  # noqa: E402
+from productcomposer.core.evr import evr_key, vercmp_key  # noqa: E402
+
+
+# versions built from the characters rpmvercmp treats specially
+versions = st.text(alphabet='019az.~^_+', max_size=8)
+optional_versions = st.none() | versions
+epochs = st.none() | st.sampled_from(['0', '1', '2', '10'])
+ops = st.sampled_from(['<', '<=', '=', '>=', '>'])
+
+
+def _cmp(a, b):
+    return (a > b) - (a < b)
+
+
+def _package(epoch, version, release):
+    pkg = Package()
+    (pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch) = ('foo', epoch, version, release, 'noarch')
+    return pkg
+
+
+@given(versions, versions)
+def test_vercmp_key_librpm(v1, v2):
+    assert _cmp(vercmp_key(v1), vercmp_key(v2)) == rpm.labelCompare(('0', v1, '1'), ('0', v2, '1'))
+
+
+@given(epochs, versions, optional_versions, epochs, versions, optional_versions)
+def test_evr_key_librpm(e1, v1, r1, e2, v2, r2):
+    assert _cmp(evr_key(e1, v1, r1), evr_key(e2, v2, r2)) == rpm.labelCompare((e1, v1, r1), (e2, v2, r2))
+    assert (_package(e1, v1, r1) < _package(e2, v2, r2)) == (rpm.labelCompare((e1, v1, r1), (e2, v2, r2)) == -1)
+
+
+@given(epochs, versions, versions, ops, epochs, versions, optional_versions)
+def test_package_matches_librpm(e1, v1, r1, op, e2, v2, r2):
+    # a missing release or epoch in the match matches every one
+    tepoch = e1 if e2 is not None else None
+    trelease = r1 if r2 is not None else None
+    cmp = rpm.labelCompare((tepoch, v1, trelease), (e2, v2, r2))
+    expected = '>' in op if cmp > 0 else '<' in op if cmp < 0 else '=' in op
+    assert _package(e1, v1, r1).matches(None, 'foo', op, e2, v2, r2) == expected
+
+
+@given(st.sampled_from(['0', '1']), versions, optional_versions, st.sampled_from(['0', '1']), versions, optional_versions)
+def test_pkgselect_cmp_evr_librpm(e1, v1, r1, e2, v2, r2):
+    sel1 = PkgSelect(f'foo={e1}:{v1}' + (f'-{r1}' if r1 is not None else ''))
+    sel2 = PkgSelect(f'foo={e2}:{v2}' + (f'-{r2}' if r2 is not None else ''))
+    # a missing release on one side is taken from the other one
+    release1 = r1 if r1 is not None else r2
+    release2 = r2 if r2 is not None else r1
+    assert sel1._cmp_evr(sel2) == rpm.labelCompare((e1, v1, release1), (e2, v2, release2))
@@ -0,0 +1,63 @@
+import os
+import pickle
+
+import pytest
+
+from productcomposer.core.HeaderCache import HeaderCache
+
+
+def test_headercache_roundtrip(tmp_path):
+    rpmfile = tmp_path / 'foo-1.0-1.noarch.rpm'
+    rpmfile.write_bytes(b'rpm')
+    cachefile = tmp_path / 'cache' / 'headers'
+
+    cache = HeaderCache(str(cachefile))
+    st = os.stat(rpmfile)
+    assert cache.get(str(rpmfile), st) is None
+    cache.put(str(rpmfile), st, 'data')
+    cache.save()
+
+    cache = HeaderCache(str(cachefile))
+    assert cache.get(str(rpmfile), st) == 'data'
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_headercache_invalidation(tmp_path):
+    rpmfile = tmp_path / 'foo-1.0-1.noarch.rpm'
+    rpmfile.write_bytes(b'rpm')
+    cache = HeaderCache(str(tmp_path / 'headers'))
+    cache.put(str(rpmfile), os.stat(rpmfile), 'data')
+
+    rpmfile.write_bytes(b'changed rpm')
+    assert cache.get(str(rpmfile), os.stat(rpmfile)) is None
+
+
+def test_headercache_size_bound(tmp_path):
+    cachefile = str(tmp_path / 'headers')
+    rpmfiles = []
+    for i in range(3):
+        rpmfile = tmp_path / f'foo-{i}-1.noarch.rpm'
+        rpmfile.write_bytes(b'rpm')
+        rpmfiles.append(rpmfile)
+
+    cache = HeaderCache(cachefile)
+    for rpmfile in rpmfiles:
+        cache.put(str(rpmfile), os.stat(rpmfile), rpmfile.name)
+    cache.save()
+
+    # the entry used in the last run survives the size bound
+    cache = HeaderCache(cachefile, maxentries=2)
+    assert cache.get(str(rpmfiles[2]), os.stat(rpmfiles[2])) == rpmfiles[2].name
+    cache.save()
+    cache = HeaderCache(cachefile, maxentries=2)
+    assert len(cache.entries) == 2
+    assert cache.get(str(rpmfiles[2]), os.stat(rpmfiles[2])) == rpmfiles[2].name
+
+
+@pytest.mark.parametrize('content', [b'\x80\x09', b'Iabc\n.', b'garbage', pickle.dumps({'format': HeaderCache.FORMAT})])
+def test_headercache_broken_file(tmp_path, content):
+    cachefile = tmp_path / 'headers'
+    cachefile.write_bytes(content)
+    cache = HeaderCache(str(cachefile))
+    assert cache.entries == {}
+    assert cache.generation == 1
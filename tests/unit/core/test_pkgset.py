@@ -0,0 +1,41 @@
+from productcomposer.core.PkgSelect import PkgSelect
+from productcomposer.core.PkgSet import PkgSet
+
+
+def _pkgset(name, specs, supportstatus=None):
+    pkgset = PkgSet(name)
+    pkgset.supportstatus = supportstatus
+    pkgset.add_specs(specs)
+    return pkgset
+
+
+def test_pkgselect_key():
+    assert PkgSelect('foo>=0:1.0') == PkgSelect('foo >= 1.0')
+    assert hash(PkgSelect('foo>=0:1.0')) == hash(PkgSelect('foo >= 1.0'))
+    assert PkgSelect('foo>=1.0') != PkgSelect('foo>=1.0-1')
+    assert PkgSelect('foo>=1.0') != PkgSelect('foo>1.0')
+    assert PkgSelect('foo') != PkgSelect('bar')
+    sel = PkgSelect('foo>=1.0').copy(op='>')
+    assert sel.key == PkgSelect('foo>1.0').key
+
+
+def test_pkgset_add():
+    pkgset = _pkgset('main', ['foo', 'bar>=1.0'])
+    pkgset.add(_pkgset('other', ['bar>=0:1.0', 'baz'], supportstatus='l3'))
+    assert [str(sel) for sel in pkgset] == ['foo', 'bar >= 1.0', 'baz']
+    assert pkgset.names() == {'foo', 'bar', 'baz'}
+    assert pkgset.byname['baz'][0].supportstatus == 'l3'
+
+
+def test_pkgset_sub_intersect():
+    pkgset = _pkgset('main', ['foo>=2.0', 'bar', 'baz'])
+    pkgset.sub(_pkgset('other', ['bar', 'foo=2.0']))
+    assert [str(sel) for sel in pkgset] == ['foo > 2.0', 'baz']
+    assert pkgset.names() == {'foo', 'baz'}
+
+    pkgset.intersect(_pkgset('other', ['foo>=1.0', 'foo>=1.0', 'qux']))
+    assert [str(sel) for sel in pkgset] == ['foo > 2.0']
+    assert pkgset.names() == {'foo'}
+    # the index follows the selectors
+    pkgset.add(_pkgset('other', ['foo>2.0', 'baz']))
+    assert [str(sel) for sel in pkgset] == ['foo > 2.0', 'baz']
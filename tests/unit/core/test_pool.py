@@ -0,0 +1,173 @@
+import os
+import pickle
+
+import pytest
+
+pytest.importorskip('rpm')
+
+from productcomposer.core.HeaderCache import HeaderCache  # noqa: E402
+from productcomposer.core.Package import Package  # noqa: E402
+from productcomposer.core.Pool import Pool  # noqa: E402
+
+from .test_rpmheader import _ints, _strings, _write_rpm  # noqa: E402
+
+
+def _tags(name, version, arch):
+    return (name, '0', version, '1', arch, f'{name}-{version}-1.src.rpm', 1, '', 'MIT')
+
+
+def _add_rpm(cache, reposdir, location, name, version, arch):
+    rpmfile = reposdir / location
+    rpmfile.parent.mkdir(parents=True, exist_ok=True)
+    rpmfile.write_bytes(f'{name}-{version}'.encode())
+    cache.put(str(rpmfile), os.stat(rpmfile), (_tags(name, version, arch), (), ()))
+
+
+def _age_directories(reposdir):
+    past = 1600000000 * 1000000000
+    for dirpath, _, _ in os.walk(reposdir):
+        os.utime(dirpath, ns=(past, past))
+
+
+def test_pool_rescan(tmp_path):
+    reposdir = tmp_path / 'repos'
+    cache = HeaderCache(str(tmp_path / 'headers'))
+    _add_rpm(cache, reposdir, 'a/foo-1.0-1.x86_64.rpm', 'foo', '1.0', 'x86_64')
+    _add_rpm(cache, reposdir, 'a/bar-1.0-1.x86_64.rpm', 'bar', '1.0', 'x86_64')
+    _add_rpm(cache, reposdir, 'b/baz-1.0-1.x86_64.rpm', 'baz', '1.0', 'x86_64')
+    _age_directories(reposdir)
+
+    pool = Pool()
+    pool.scan(str(reposdir), header_cache=cache, arches=['x86_64'])
+    snapshot = str(tmp_path / 'snapshot')
+    pool.save_snapshot(snapshot)
+    assert not Pool().load_snapshot(snapshot, str(reposdir), ['aarch64'])
+    assert not Pool().load_snapshot(snapshot, str(reposdir), ['x86_64'], use_repodata=True)
+    pool = Pool()
+    assert pool.load_snapshot(snapshot, str(reposdir), ['x86_64'])
+    assert str(pool.lookup_rpm('x86_64', 'baz')) == 'baz-1.0-1.x86_64'
+
+    os.unlink(reposdir / 'a/foo-1.0-1.x86_64.rpm')
+    _add_rpm(cache, reposdir, 'a/foo-2.0-1.x86_64.rpm', 'foo', '2.0', 'x86_64')
+    _add_rpm(cache, reposdir, 'a/bar-1.0-1.x86_64.rpm', 'bar', '1.1', 'x86_64')
+    _add_rpm(cache, reposdir, 'a/foo-2.0-1.aarch64.rpm', 'foo', '2.0', 'aarch64')
+    # not noticed, the directory did not change
+    _add_rpm(cache, reposdir, 'b/baz-1.0-1.x86_64.rpm', 'baz', '1.1', 'x86_64')
+    _age_directories(reposdir / 'b')
+
+    changes = pool.rescan(header_cache=cache)
+    assert changes == {
+        'added': ['a/foo-2.0-1.x86_64.rpm'],
+        'changed': ['a/bar-1.0-1.x86_64.rpm'],
+        'removed': ['a/foo-1.0-1.x86_64.rpm'],
+    }
+    assert str(pool.lookup_rpm('x86_64', 'foo')) == 'foo-2.0-1.x86_64'
+    assert [str(rpm) for rpm in pool.lookup_all_rpms('x86_64', 'bar')] == ['bar-1.1-1.x86_64']
+    assert str(pool.lookup_rpm('x86_64', 'baz')) == 'baz-1.0-1.x86_64'
+    assert pool.rescan(header_cache=cache) == {'added': [], 'changed': [], 'removed': []}
+
+
+@pytest.mark.parametrize('content', [b'\x80\x09', b'Iabc\n.', pickle.dumps({'format': Pool.SNAPSHOT_FORMAT}),
+                                     pickle.dumps({'format': Pool.SNAPSHOT_FORMAT, 'scan_state': {}})])
+def test_pool_broken_snapshot(tmp_path, content):
+    snapshot = tmp_path / 'snapshot'
+    snapshot.write_bytes(content)
+    pool = Pool()
+    assert not pool.load_snapshot(str(snapshot), str(tmp_path), None)
+    assert pool.scan_state is None and not pool.rpms
+
+
+def test_pool_remove_rpm_versions():
+    from productcomposer.core.Package import Package
+
+    pools = (Pool(), Pool())
+    for pool in pools:
+        for epoch, version, release in (('0', '1.0', '1'), ('0', '1.0', '2'), ('1', '1.0', '1'), ('0', '1.00', '1'), ('0', '2.0', '1')):
+            tags = ('foo', epoch, version, release, 'x86_64', 'foo-1.0-1.src.rpm', 1, '', 'MIT')
+            pool.add_rpm(Package(f'foo-{epoch}-{version}-{release}.rpm', cachedata=(tags, (), ())))
+
+    keys = [('foo', None, '1.0'), ('foo', '1', '1.0'), ('bar', None, '1.0')]
+    removed = pools[0].remove_rpm_versions(keys)
+    for name, epoch, version in keys:
+        pools[1].remove_rpms(None, name, '=', epoch, version, None)
+    assert [str(rpm) for rpm in pools[0].lookup_all_rpms(None, 'foo')] == [str(rpm) for rpm in pools[1].lookup_all_rpms(None, 'foo')] == ['foo-2.0-1.x86_64']
+    assert len(removed[('foo', None, '1.0')]) == 4
+    assert [str(rpm) for rpm in removed[('foo', '1', '1.0')]] == ['foo-1:1.0-1.x86_64']
+    assert ('bar', None, '1.0') not in removed
+    for pool in pools:
+        assert str(pool.lookup_rpm('x86_64', 'foo')) == 'foo-2.0-1.x86_64'
+        assert pool.lookup_nevra('x86_64', 'foo', None, '1.0', '2') is None
+        assert str(pool.lookup_sourcerpm_binary('foo-1.0-1.src.rpm', 'x86_64', 'foo')) == 'foo-2.0-1.x86_64'
+
+
+def test_pool_resolve_pkgset():
+    from productcomposer.core.Package import Package
+    from productcomposer.core.PkgSet import PkgSet
+
+    pool = Pool()
+    for name, version, arch in (('foo', '1.0', 'x86_64'), ('foo', '2.0', 'noarch'), ('foo', '1.5', 'aarch64'), ('bar', '1.0', 'x86_64')):
+        tags = (name, '0', version, '1', arch, f'{name}-{version}-1.src.rpm', 1, '', 'MIT')
+        pool.add_rpm(Package(f'{name}-{version}-1.{arch}.rpm', cachedata=(tags, (), ())))
+    pkgset = PkgSet('main')
+    pkgset.add_specs(['foo', 'foo<2.0', 'foo>=1.0-2', 'bar>1.0', 'baz'])
+
+    for all_versions in (False, True):
+        resolved = pool.resolve_pkgset('x86_64', pkgset, all_versions=all_versions)
+        assert [sel for sel, _ in resolved] == list(pkgset)
+        for sel, rpms in resolved:
+            if all_versions:
+                expected = pool.lookup_all_rpms('x86_64', sel.name, sel.op, sel.epoch, sel.version, sel.release)
+            else:
+                rpm = pool.lookup_rpm('x86_64', sel.name, sel.op, sel.epoch, sel.version, sel.release)
+                expected = [rpm] if rpm else []
+            assert rpms == expected
+    assert [str(rpm) for rpm in pool.resolve_pkgset('x86_64', pkgset, all_versions=True)[0][1]] == ['foo-1.0-1.x86_64', 'foo-2.0-1.noarch']
+
+
+def test_pool_lookup_all_rpms_order():
+    from productcomposer.core.Package import Package
+
+    pool = Pool()
+    for location, version, arch in (('b/foo-2.0-1.noarch.rpm', '2.0', 'noarch'), ('a/foo-1.0-1.noarch.rpm', '1.0', 'noarch'),
+                                    ('c/foo-2.0-1.x86_64.rpm', '2.0', 'x86_64'), ('d/foo-1.0-1.x86_64.rpm', '1.0', 'x86_64')):
+        pool.add_rpm(Package(location, cachedata=(_tags('foo', version, arch), (), ())))
+    # sorted by evr, the architecture before noarch for the same evr
+    assert [rpm.location for rpm in pool.lookup_all_rpms('x86_64', 'foo')] == [
+        'd/foo-1.0-1.x86_64.rpm', 'a/foo-1.0-1.noarch.rpm', 'c/foo-2.0-1.x86_64.rpm', 'b/foo-2.0-1.noarch.rpm']
+    assert [rpm.location for rpm in pool.lookup_all_rpms(None, 'foo')] == [
+        'a/foo-1.0-1.noarch.rpm', 'd/foo-1.0-1.x86_64.rpm', 'b/foo-2.0-1.noarch.rpm', 'c/foo-2.0-1.x86_64.rpm']
+
+
+def test_pool_parallel_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(Package, 'header_reader', 'mmap')
+    reposdir = tmp_path / 'repos'
+    for repo in ('a', 'b'):
+        for name, version, arch in (('foo', '1.0', 'x86_64'), ('foo', '2.0', 'x86_64'), ('foo', '1.0', 'noarch'),
+                                    ('foo', '1.5', 'aarch64'), ('bar', '1.0', 'noarch'), (f'{repo}only', '1.0', 'x86_64')):
+            (reposdir / repo / arch).mkdir(parents=True, exist_ok=True)
+            _write_rpm(reposdir / repo / arch / f'{name}-{version}-1.{arch}.rpm', [
+                (1000, 6, 1, _strings(name)),
+                (1001, 6, 1, _strings(version)),
+                (1002, 6, 1, _strings('1')),
+                (1003, 4, 1, _ints(0)),
+                (1006, 4, 1, _ints(1)),
+                (1014, 6, 1, _strings('MIT')),
+                (1022, 6, 1, _strings(arch)),
+                (1044, 6, 1, _strings(f'{name}-{version}-1.src.rpm')),
+            ])
+
+    def _order(pool):
+        return ({name: [rpm.location for rpm in rpms] for name, rpms in pool.rpms.items()},
+                {arch: {name: [rpm.location for rpm in rpms] for name, rpms in names.items()} for arch, names in pool.byarch.items()},
+                list(pool.bylocation))
+
+    pools = (Pool(), Pool())
+    pools[0].scan(str(reposdir), jobs=1)
+    pools[1].scan(str(reposdir), jobs=3)
+    assert len(pools[0].bylocation) == 12
+    assert _order(pools[0]) == _order(pools[1])
+    for arch in ('x86_64', 'aarch64', None):
+        for name in ('foo', 'bar', 'aonly'):
+            assert [rpm.location for rpm in pools[0].lookup_all_rpms(arch, name)] == [rpm.location for rpm in pools[1].lookup_all_rpms(arch, name)]
+            assert str(pools[0].lookup_rpm(arch, name)) == str(pools[1].lookup_rpm(arch, name))
+    assert str(pools[1].lookup_rpm('x86_64', 'foo')) == 'foo-2.0-1.x86_64'
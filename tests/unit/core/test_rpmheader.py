@@ -0,0 +1,82 @@
+import struct
+
+import pytest
+
+from productcomposer.core.RpmHeader import LEAD_SIZE, HEADER_MAGIC, RpmHeader, RpmHeaderError
+
+
+def _header(entries):
+    index = b''
+    store = b''
+    for tag, tagtype, count, data in entries:
+        if tagtype == 4:
+            store += b'\0' * (-len(store) % 4)
+        index += struct.pack('>iiii', tag, tagtype, len(store), count)
+        store += data
+    return HEADER_MAGIC + b'\0' * 4 + struct.pack('>ii', len(entries), len(store)) + index + store
+
+
+def _strings(*values):
+    return b''.join(v.encode() + b'\0' for v in values)
+
+
+def _ints(*values):
+    return struct.pack(f'>{len(values)}I', *values)
+
+
+def _write_rpm(path, entries):
+    # a signature header of 5 bytes to check the padding
+    sig = _header([(1000, 7, 5, b'12345')])
+    sig += b'\0' * (-len(sig) % 8)
+    path.write_bytes(b'\0' * LEAD_SIZE + sig + _header(entries) + b'payload')
+    return str(path)
+
+
+def test_rpmheader_tags(tmp_path):
+    location = _write_rpm(tmp_path / 'foo-1.0-1.x86_64.rpm', [
+        (1000, 6, 1, _strings('foo')),
+        (1001, 6, 1, _strings('1.0')),
+        (1002, 6, 1, _strings('1')),
+        (1003, 4, 1, _ints(2)),
+        (1014, 6, 1, _strings('MIT')),
+        (1022, 6, 1, _strings('x86_64')),
+        (1047, 8, 2, _strings('foo', 'libfoo.so.1()(64bit)')),
+        (1112, 4, 2, _ints(0x08, 0)),
+        (1113, 8, 2, _strings('2:1.0-1', '')),
+        (1049, 8, 2, _strings('bar', 'rpmlib(PayloadIsZstd)')),
+        (1048, 4, 2, _ints(0x08 | 0x04, 0x08 | 0x02 | 0x1000000)),
+        (1050, 8, 2, _strings('2', '5.4.18-1')),
+        (5008, 5, 1, struct.pack('>Q', 5 << 32)),
+    ])
+    with RpmHeader(location) as h:
+        assert (h['name'], h['version'], h['release'], h['epoch']) == ('foo', '1.0', '1', 2)
+        assert (h['license'], h['arch']) == ('MIT', 'x86_64')
+        assert h['sourcerpm'] is None
+        assert h['nosource'] == []
+        assert h['filesizes'] == [5 << 32]
+        assert h.deps('provides') == ['foo = 2:1.0-1', 'libfoo.so.1()(64bit)']
+        assert h.deps('requires') == ['bar >= 2', 'rpmlib(PayloadIsZstd) <= 5.4.18-1']
+
+
+def test_rpmheader_bad_file(tmp_path):
+    rpmfile = tmp_path / 'foo.rpm'
+    rpmfile.write_bytes(b'\0' * 200)
+    with pytest.raises(RpmHeaderError):
+        RpmHeader(str(rpmfile))
+
+    location = _write_rpm(tmp_path / 'bar.rpm', [(1000, 6, 1, _strings('bar'))])
+    with open(location, 'r+b') as f:
+        f.truncate(LEAD_SIZE + 40)
+    with pytest.raises(RpmHeaderError):
+        RpmHeader(location)
+
+    # strings that run past the end of the header
+    location = _write_rpm(tmp_path / 'baz.rpm', [(1000, 6, 1, _strings('baz')), (1047, 8, 3, _strings('baz', 'libbaz'))])
+    with RpmHeader(location) as h:
+        assert h['name'] == 'baz'
+        with pytest.raises(RpmHeaderError):
+            h['providename']
+    location = _write_rpm(tmp_path / 'qux.rpm', [(1000, 6, 1, b'qux')])
+    with RpmHeader(location) as h:
+        with pytest.raises(RpmHeaderError):
+            h['name']
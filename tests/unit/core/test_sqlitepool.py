@@ -0,0 +1,106 @@
+import os
+import sqlite3
+
+import pytest
+
+pytest.importorskip('rpm')
+
+from productcomposer.core.HeaderCache import HeaderCache  # noqa: E402
+from productcomposer.core.Pool import Pool  # noqa: E402
+from productcomposer.core.SqlitePool import SqlitePool, SqlitePoolError  # noqa: E402
+
+
+RPMS = [
+    ('x86_64/foo-1.0-1.x86_64.rpm', ('foo', '0', '1.0', '1', 'x86_64', 'foo-1.0-1.src.rpm', 1, '', 'MIT'), ('foo = 1.0-1',)),
+    ('x86_64/foo-1.10-1.x86_64.rpm', ('foo', '0', '1.10', '1', 'x86_64', 'foo-1.10-1.src.rpm', 1, '', 'MIT'), ('foo = 1.10-1',)),
+    ('noarch/foo-1.2-1.noarch.rpm', ('foo', '0', '1.2', '1', 'noarch', 'foo-1.2-1.src.rpm', 1, '', 'MIT'), ()),
+    ('aarch64/foo-2.0-1.aarch64.rpm', ('foo', '0', '2.0', '1', 'aarch64', 'foo-2.0-1.src.rpm', 1, '', 'MIT'), ()),
+    ('x86_64/foo-debuginfo-1.10-1.x86_64.rpm', ('foo-debuginfo', '0', '1.10', '1', 'x86_64', 'foo-1.10-1.src.rpm', 1, '', 'MIT'), ()),
+    ('src/foo-1.10-1.src.rpm', ('foo', '0', '1.10', '1', 'src', None, 1, '', 'MIT'), ()),
+]
+
+
+@pytest.fixture
+def repos(tmp_path):
+    reposdir = tmp_path / 'repos'
+    cache = HeaderCache(str(tmp_path / 'headers'))
+    for location, tags, provides in RPMS:
+        rpmfile = reposdir / location
+        rpmfile.parent.mkdir(parents=True, exist_ok=True)
+        rpmfile.write_bytes(b'rpm')
+        cache.put(str(rpmfile), os.stat(rpmfile), (tags, provides, ()))
+    return (str(reposdir), cache)
+
+
+def _nevras(rpms):
+    return [str(rpm) for rpm in rpms]
+
+
+def test_sqlitepool_matches_pool(tmp_path, repos):
+    (reposdir, cache) = repos
+    pool = Pool()
+    pool.scan(reposdir, header_cache=cache, arches=['x86_64'])
+    dbpool = SqlitePool(str(tmp_path / 'pool.db'))
+    dbpool.scan(reposdir, header_cache=cache, arches=['x86_64'])
+
+    for p in (pool, dbpool):
+        p.remove_rpms(None, 'foo', '=', None, '1.0', None)
+    for arch in (None, 'x86_64', 'noarch', 'src'):
+        assert dbpool.names(arch) == pool.names(arch)
+        for op, version in ((None, None), ('>=', '1.2'), ('<', '1.10')):
+            assert _nevras(dbpool.lookup_all_rpms(arch, 'foo', op, None, version, None)) == _nevras(pool.lookup_all_rpms(arch, 'foo', op, None, version, None))
+            assert str(dbpool.lookup_rpm(arch, 'foo', op, None, version, None)) == str(pool.lookup_rpm(arch, 'foo', op, None, version, None))
+    assert str(dbpool.lookup_nevra('x86_64', 'foo-debuginfo', '0', '1.10', '1')) == 'foo-debuginfo-1.10-1.x86_64'
+    assert str(dbpool.lookup_sourcerpm_binary('foo-1.10-1.src.rpm', 'x86_64', 'foo-debuginfo')) == 'foo-debuginfo-1.10-1.x86_64'
+    rpm = dbpool.lookup_rpm('x86_64', 'foo')
+    assert dbpool.lookup_product_cpeids(rpm) == pool.lookup_product_cpeids(pool.lookup_rpm('x86_64', 'foo'))
+
+
+def test_sqlitepool_reuse(tmp_path, repos):
+    (reposdir, cache) = repos
+    dbfile = str(tmp_path / 'pool.db')
+    dbpool = SqlitePool(dbfile)
+    dbpool.scan(reposdir, header_cache=cache)
+    assert len(dbpool.changes['added']) == len(RPMS)
+    dbpool.remove_rpms(None, 'foo')
+    dbpool.close()
+
+    # removals are not stored and unchanged rpms are not read again
+    os.unlink(os.path.join(reposdir, 'aarch64/foo-2.0-1.aarch64.rpm'))
+    dbpool = SqlitePool(dbfile)
+    dbpool.scan(reposdir, header_cache=cache)
+    assert dbpool.changes == {'added': [], 'changed': [], 'removed': ['aarch64/foo-2.0-1.aarch64.rpm']}
+    assert str(dbpool.lookup_rpm('x86_64', 'foo')) == 'foo-1.10-1.x86_64'
+
+
+def test_sqlitepool_foreign_database(tmp_path):
+    dbfile = str(tmp_path / 'other.db')
+    db = sqlite3.connect(dbfile)
+    with db:
+        db.execute("CREATE TABLE rpms (name TEXT)")
+        db.execute("INSERT INTO rpms VALUES ('keep')")
+    db.close()
+    for readonly in (False, True):
+        with pytest.raises(SqlitePoolError):
+            SqlitePool(dbfile, readonly=readonly)
+    db = sqlite3.connect(dbfile)
+    assert db.execute("SELECT name FROM rpms").fetchall() == [('keep',)]
+    db.close()
+
+
+def test_sqlitepool_old_format(tmp_path):
+    dbfile = str(tmp_path / 'pool.db')
+    pool = SqlitePool(dbfile)
+    with pool.db:
+        pool._set_meta('format', '0')
+        pool._set_meta('directory', str(tmp_path))
+    pool.close()
+    with pytest.raises(SqlitePoolError):
+        SqlitePool(dbfile, readonly=True)
+    pool = SqlitePool(dbfile)
+    assert pool._get_meta('format') == str(SqlitePool.FORMAT)
+    assert pool.directory() is None
+    pool.close()
+    pool = SqlitePool(dbfile, readonly=True)
+    assert pool.directory() is None
+    pool.close()
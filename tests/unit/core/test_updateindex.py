@@ -0,0 +1,31 @@
+from productcomposer.core.Updateinfo import Updateinfo
+from productcomposer.core.UpdateIndex import UpdateIndex
+
+
+def _updateinfo(path, updates):
+    xml = '<updates>'
+    for updateid, updatetype, blocked, src in updates:
+        xml += f'<update type="{updatetype}"><id>{updateid}</id>'
+        if blocked:
+            xml += '<blocked_in_product><product>SLES</product></blocked_in_product>'
+        xml += f'<pkglist><collection><package name="foo" arch="x86_64" src="{src}"/></collection></pkglist></update>'
+    path.write_text(xml + '</updates>')
+    return Updateinfo(str(path))
+
+
+def test_updateindex(tmp_path):
+    index = UpdateIndex()
+    index.add(_updateinfo(tmp_path / 'b-updateinfo.xml', [('U-2', 'security', True, 'x86_64/foo-2.rpm')]))
+    index.add(_updateinfo(tmp_path / 'a-updateinfo.xml', [
+        ('U-1', 'recommended', False, 'x86_64/foo-1.rpm'),
+        ('patchinfo.ga', '_internal', False, 'x86_64/foo-0.rpm'),
+        ('U-2', 'security', False, 'x86_64/foo-3.rpm'),
+    ]))
+
+    assert [update.id for _, update in index.entries()] == ['U-1', 'patchinfo.ga', 'U-2', 'U-2']
+    assert [update.id for _, update in index.exported()] == ['U-1', 'U-2', 'U-2']
+    assert [update.packages[0].src for update in index.blocked()] == ['x86_64/foo-2.rpm']
+    assert len(index.byid['U-2']) == 2
+    assert index.is_referenced('x86_64/foo-1.rpm')
+    assert not index.is_referenced('x86_64/foo-0.rpm')
+    assert not index.is_referenced('x86_64/bar-1.rpm')
@@ -0,0 +1,47 @@
+from xml.etree import ElementTree as ET
+
+from productcomposer.core.Updateinfo import Updateinfo
+
+
+UPDATEINFO = """<updates>
+  <update from="maint-coord@suse.de" status="stable" type="security" version="1">
+    <id>SUSE-2024-1</id>
+    <title>Security update for foo</title>
+    <blocked_in_product><product>SLES</product></blocked_in_product>
+    <pkglist>
+      <collection>
+        <package name="foo" epoch="0" version="1.0" release="1.1" arch="x86_64" src="x86_64/foo-1.0-1.1.x86_64.rpm">
+          <filename>foo-1.0-1.1.x86_64.rpm</filename>
+        </package>
+        <package name="foo" epoch="0" version="1.0" release="1.1" arch="src" src="src/foo-1.0-1.1.src.rpm"/>
+      </collection>
+    </pkglist>
+  </update>
+  <update status="stable" type="_internal">
+    <id>patchinfo.ga</id>
+    <blocked_in_product/>
+  </update>
+</updates>
+"""
+
+
+def test_updateinfo(tmp_path):
+    filename = tmp_path / 'updateinfo.xml'
+    filename.write_text(UPDATEINFO)
+    u = Updateinfo(str(filename))
+    assert [(update.id, update.type, update.blocked) for update in u.updates] == [
+        ('SUSE-2024-1', 'security', True),
+        ('patchinfo.ga', '_internal', False),
+    ]
+    assert [(pkg.name, pkg.arch, pkg.src) for pkg in u.updates[0].packages] == [
+        ('foo', 'x86_64', 'x86_64/foo-1.0-1.1.x86_64.rpm'),
+        ('foo', 'src', 'src/foo-1.0-1.1.src.rpm'),
+    ]
+    assert u.updates[1].packages == ()
+
+    # every call returns a new copy of the complete element
+    element = u.updates[0].element()
+    assert element.findtext('title') == 'Security update for foo'
+    element.find('pkglist/collection').clear()
+    assert len(u.updates[0].element().findall('pkglist/collection/package')) == 2
+    assert ET.tostring(u.updates[0].element()) == ET.tostring(ET.fromstring(UPDATEINFO)[0]).rstrip()
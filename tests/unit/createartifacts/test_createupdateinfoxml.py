@@ -0,0 +1,43 @@
+from xml.etree import ElementTree as ET
+
+import pytest
+import zstandard
+
+pytest.importorskip('rpm')
+
+from productcomposer.createartifacts.createupdateinfoxml import (UpdateinfoWriter, element_fingerprint,  # noqa: E402
+                                                                updateinfo_id, updateinfo_package_key)
+
+
+def test_element_fingerprint():
+    a = ET.fromstring('<references>\n  <reference href="x" id="1" type="cve"/>\n</references>')
+    b = ET.fromstring('<references><reference type="cve" id="1" href="x"/></references>')
+    c = ET.fromstring('<references><reference type="cve" id="2" href="x"/></references>')
+    assert element_fingerprint(a) == element_fingerprint(b)
+    assert element_fingerprint(a) != element_fingerprint(c)
+
+
+def test_updateinfo_package_key():
+    pkgentry = ET.fromstring('<package name="foo" version="1.0" release="1" arch="noarch" src="noarch/foo.rpm"/>')
+    assert updateinfo_package_key(pkgentry) == ('foo', None, '1.0', '1', 'noarch')
+
+
+def test_updateinfo_id():
+    yml = {'set_updateinfo_id_prefix': 'SUSE-'}
+    assert updateinfo_id(yml, 'SUSE-2024-1') == 'SUSE-2024-1'
+    assert updateinfo_id(yml, '2024-1') == 'SUSE-2024-1'
+    assert updateinfo_id({'set_updateinfo_id_prefix': ''}, '2024-1') == '2024-1'
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_updateinfo_writer(tmp_path, compress):
+    writer = UpdateinfoWriter(str(tmp_path / 'updateinfo.xml'), compress)
+    assert not writer.close()
+    for update_id in ('1', '2'):
+        writer.write(ET.fromstring(f'<update><id>{update_id}</id></update>'))
+    assert writer.close()
+
+    opener = zstandard.open if compress else open
+    with opener(writer.filename, 'rt') as f:
+        content = f.read()
+    assert content == '<updates>\n  <update><id>1</id></update>\n  <update><id>2</id></update>\n  </updates>\n'
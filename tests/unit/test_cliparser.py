@@ -0,0 +1,12 @@
+import pytest
+
+from productcomposer.cliparser import build_parser
+
+
+def test_cliparser_pool_options():
+    parser = build_parser()
+    args = parser.parse_args(['build', '--pool-snapshot', 'pool.snapshot', 'default.productcompose', 'out'])
+    assert args.pool_snapshot == 'pool.snapshot' and args.pool_db is None
+    assert parser.parse_args(['verify', '--pool-db', 'pool.db', 'default.productcompose']).pool_db == 'pool.db'
+    with pytest.raises(SystemExit):
+        parser.parse_args(['build', '--pool-db', 'pool.db', '--pool-snapshot', 'pool.snapshot', 'default.productcompose', 'out'])
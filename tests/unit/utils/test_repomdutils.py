@@ -0,0 +1,69 @@
+import gzip
+
+from productcomposer.utils.repomdutils import iter_primary_packages
+
+REPOMD = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo" xmlns:rpm="http://linux.duke.edu/metadata/rpm">
+  <data type="primary">
+    <location href="repodata/primary.xml.gz"/>
+  </data>
+</repomd>
+"""
+
+PRIMARY = """<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="2">
+<package type="rpm">
+  <name>sles-release</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="16.0" rel="1.1"/>
+  <checksum type="sha256" pkgid="YES">abc</checksum>
+  <time file="1700000000" build="1690000000"/>
+  <size package="4242" installed="100" archive="200"/>
+  <location href="x86_64/sles-release-16.0-1.1.x86_64.rpm"/>
+  <format>
+    <rpm:license>SUSE-EULA</rpm:license>
+    <rpm:sourcerpm>sles-release-16.0-1.1.src.rpm</rpm:sourcerpm>
+    <rpm:provides>
+      <rpm:entry name="product-cpeid()" flags="EQ" epoch="0" ver="cpe%3A%2Fo%3Asuse%3Asles%3A16"/>
+      <rpm:entry name="sles-release" flags="EQ" epoch="1" ver="16.0" rel="1.1"/>
+      <rpm:entry name="product()"/>
+    </rpm:provides>
+    <rpm:requires>
+      <rpm:entry name="libc.so.6()(64bit)"/>
+    </rpm:requires>
+  </format>
+</package>
+<package type="rpm">
+  <name>sles-release</name>
+  <arch>src</arch>
+  <version epoch="0" ver="16.0" rel="1.1"/>
+  <checksum type="sha256" pkgid="YES">def</checksum>
+  <time file="1700000001" build="1690000000"/>
+  <size package="2121" installed="100" archive="200"/>
+  <location href="src/sles-release-16.0-1.1.src.rpm"/>
+  <format>
+    <rpm:license>SUSE-EULA</rpm:license>
+    <rpm:sourcerpm/>
+  </format>
+</package>
+</metadata>
+"""
+
+
+def test_iter_primary_packages(tmp_path):
+    (tmp_path / 'repodata').mkdir()
+    (tmp_path / 'repodata' / 'repomd.xml').write_text(REPOMD)
+    with gzip.open(tmp_path / 'repodata' / 'primary.xml.gz', 'wt') as f:
+        f.write(PRIMARY)
+
+    pkgs = list(iter_primary_packages(str(tmp_path)))
+    assert len(pkgs) == 2
+    pkg = pkgs[0]
+    assert pkg['location'] == 'x86_64/sles-release-16.0-1.1.x86_64.rpm'
+    assert (pkg['name'], pkg['epoch'], pkg['version'], pkg['release'], pkg['arch']) == ('sles-release', '0', '16.0', '1.1', 'x86_64')
+    assert (pkg['size'], pkg['filetime'], pkg['buildtime']) == (4242, 1700000000, 1690000000)
+    assert pkg['sourcerpm'] == 'sles-release-16.0-1.1.src.rpm'
+    assert pkg['provides'] == ['product-cpeid() = cpe%3A%2Fo%3Asuse%3Asles%3A16', 'sles-release = 1:16.0-1.1', 'product()']
+    assert pkg['requires'] == ['libc.so.6()(64bit)']
+    assert pkgs[1]['arch'] == 'src'
+    assert pkgs[1]['sourcerpm'] is None
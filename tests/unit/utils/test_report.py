@@ -0,0 +1,16 @@
+from productcomposer.utils.report import TreeManifest
+
+
+def test_tree_manifest():
+    manifest = TreeManifest()
+    manifest.add('/out/repo/x86_64/foo-1.0-1.x86_64.rpm', 'foo')
+    manifest.add('/out/repo//x86_64/foo-1.0-1.x86_64.rpm', 'bar')
+    manifest.add('/out/repo/x86_64/foo-1.0-1.x86_64.slsa_provenance.json')
+    manifest.add('/out/repo-Debug/x86_64/foo-debuginfo-1.0-1.x86_64.rpm', 'foo-debuginfo')
+
+    assert '/out/repo/./x86_64/foo-1.0-1.x86_64.rpm' in manifest
+    assert '/out/repo/x86_64/foo-1.0-1.x86_64.slsa_provenance.json' in manifest
+    assert '/out/repo/x86_64/bar-1.0-1.x86_64.rpm' not in manifest
+    # the first entry wins and files without a package are not reported
+    assert manifest.packages('/out/repo') == [('/out/repo/x86_64/foo-1.0-1.x86_64.rpm', 'foo')]
+    assert manifest.packages('/out/repo-Debug/') == [('/out/repo-Debug/x86_64/foo-debuginfo-1.0-1.x86_64.rpm', 'foo-debuginfo')]
@@ -0,0 +1,46 @@
+from productcomposer.utils.rpmutils import PkgSetResolver, create_package_set, package_set_dependencies
+
+
+def _packageset(name, packages=None, architectures=None, flavors=None, add=None, sub=None):
+    return {'name': name, 'flavors': flavors, 'architectures': architectures, 'supportstatus': None,
+            'packages': packages, 'add': add, 'sub': sub, 'intersect': None}
+
+
+def test_pkgset_resolver():
+    yml = {'packagesets': [
+        _packageset('base', ['foo', 'bar']),
+        _packageset('extra', ['baz'], architectures=['x86_64']),
+        _packageset('extra', ['qux'], architectures=['aarch64']),
+        _packageset('main', add=['base', 'extra'], sub=['drop']),
+        _packageset('drop', ['bar']),
+    ]}
+    pkgsets = PkgSetResolver(yml)
+    assert pkgsets.get('x86_64', None, 'main').names() == {'foo', 'baz'}
+    assert pkgsets.stats == {'evaluated': 4, 'cached': 0}
+    assert pkgsets.get('x86_64', None, 'main') is pkgsets.get('x86_64', '', 'main')
+    assert pkgsets.stats == {'evaluated': 4, 'cached': 2}
+    # base and drop do not depend on the architecture
+    assert pkgsets.get('aarch64', None, 'main').names() == {'foo', 'qux'}
+    assert pkgsets.stats == {'evaluated': 6, 'cached': 4}
+    assert pkgsets.get('x86_64', None, 'base architecture=aarch64') is pkgsets.get('aarch64', None, 'base')
+    assert create_package_set(yml, 'aarch64', None, 'main').names() == {'foo', 'qux'}
+
+
+def test_package_set_dependencies():
+    yml = {'packagesets': [
+        _packageset('base', ['foo']),
+        _packageset('extra', ['baz'], architectures=['x86_64']),
+        _packageset('desktop', ['qux'], flavors=['dvd']),
+        _packageset('main', add=['base', 'extra']),
+        _packageset('dvd', add=['main', 'desktop', '__all__ architecture=x86_64']),
+        _packageset('fixed', add=['extra architecture=x86_64', 'desktop flavor=dvd']),
+        _packageset('loop', add=['loop']),
+    ]}
+    dependencies = package_set_dependencies(yml)
+    assert dependencies['base'] == (False, False)
+    assert dependencies['extra'] == (True, False)
+    assert dependencies['desktop'] == (False, True)
+    assert dependencies['main'] == (True, False)
+    assert dependencies['dvd'] == (True, True)
+    assert dependencies['fixed'] == (False, False)
+    assert dependencies['loop'] == (True, True)